@@ -0,0 +1,174 @@
+import functools
+import math
+import time
+from typing import NamedTuple, Optional, Tuple
+
+from bin.session import (
+    SessionScheduler,
+    PairBackend,
+    SearchEngine,
+    get_resolvable_design_shape,
+    get_table_sizes
+)
+
+# Диапазон мест за столом, из которого подбираются конфигурации
+MIN_SEATS = 2
+MAX_SEATS = 8
+
+# Бюджет моделирования всех вариантов в миллисекундах, делится поровну между вариантами.
+# Сессия моделируется для реального числа участников; если бюджета варианту не хватило,
+# оставшиеся раунды оцениваются по последнему смоделированному раунду.
+# Запас до секунды оставлен на создание планировщиков и подбор вариантов
+SIMULATION_TIME_MS = 600
+# Попыток поиска на раунд: пакетный поиск дешевый и детерминированный
+SIMULATION_ATTEMPTS = 8
+
+# Рекомендуемая конфигурация - с наименьшим числом раундов на единицу покрытия
+# среди вариантов с балансом столов не ниже MIN_BALANCE
+MIN_BALANCE = 0.75
+
+
+class ConfigurationOption(NamedTuple):
+    """
+    Вариант рассадки: столы, места, число раундов, которое сыграла смоделированная
+    сессия, доля встретившихся пар к последнему раунду и баланс столов (отношение
+    меньшего стола к большему).
+    exact - раунды и покрытие получены из резольвабельного дизайна, а не моделированием.
+    estimated - моделированию не хватило бюджета времени, и часть раундов оценена
+    """
+    tables: int
+    seats: int
+    rounds: int
+    coverage: float
+    balance: float
+    exact: bool
+    estimated: bool = False
+
+
+@functools.lru_cache(maxsize=None)
+def _simulate_session(participants_count: int, tables: int, seats: int, time_budget_ms: float) -> Tuple[int, float, bool]:
+    """
+    Моделирует сессию для полного состава пакетным поиском: раунды генерируются,
+    пока планировщик не остановится (все встретились или достигнут предел раундов).
+    Если бюджет времени закончился раньше, сессия считается идущей до предела
+    раундов, а каждый оставшийся раунд - встречающим ту же долю еще незнакомых пар,
+    что и последний смоделированный. Результат кэшируется
+
+    :return: (число раундов, покрытие к последнему раунду, оценено ли продолжение)
+    """
+    scheduler = SessionScheduler(
+        participants=list(range(participants_count)),
+        n=tables,
+        m=seats,
+        pair_backend=PairBackend.matrix.value,
+        engine=SearchEngine.batch.value,
+        use_designs=False
+    )
+    scheduler.verbose = False
+    deadline = time.perf_counter() + time_budget_ms / 1000
+    # Доля незнакомых пар, встретившихся в последнем смоделированном раунде
+    last_met_share = 0.0
+    while time.perf_counter() < deadline:
+        unmet_pairs = scheduler.get_total_pairs_count() - scheduler.get_met_pairs_count()
+        # Срок передается и в поиск раунда, чтобы последний раунд не выходил за бюджет
+        remaining_ms = (deadline - time.perf_counter()) * 1000
+        if scheduler.generate_next_round(attempts=SIMULATION_ATTEMPTS, deadline_ms=max(remaining_ms, 0)) is None:
+            rounds = len(scheduler.rounds)
+            scheduler.close()
+            return rounds, scheduler.get_coverage_percentage(), False
+        last_met_share = 1 - (scheduler.get_total_pairs_count() - scheduler.get_met_pairs_count()) / unmet_pairs
+
+    stats = scheduler.get_session_stats()
+    scheduler.close()
+    remaining_rounds = max(0, stats['max_rounds'] - stats['total_rounds'])
+    unmet_share = (1 - stats['coverage_percentage']) * (1 - last_met_share) ** remaining_rounds
+    return stats['total_rounds'] + remaining_rounds, 1 - unmet_share, True
+
+
+def _evaluate_configuration(participants_count: int, seats: int, time_budget_ms: float) -> ConfigurationOption:
+    tables = math.ceil(participants_count / seats)
+    sizes = get_table_sizes(participants_count, tables, seats)
+    balance = sizes[-1] / sizes[0] if sizes else 0.0
+    # Лишние места не используются: 9 участников за 2 столами по 8 мест - это столы по 5 и 4
+    seats = sizes[0] if sizes else seats
+
+    design_shape = get_resolvable_design_shape(participants_count, seats)
+    if design_shape is not None and design_shape[1] <= tables:
+        design_rounds, design_tables = design_shape
+        return ConfigurationOption(design_tables, seats, design_rounds, 1.0, 1.0, True)
+
+    rounds, coverage, estimated = _simulate_session(participants_count, tables, seats, time_budget_ms)
+    return ConfigurationOption(tables, seats, rounds, round(coverage, 3), balance, False, estimated)
+
+
+def _dominates(first: ConfigurationOption, second: ConfigurationOption) -> bool:
+    not_worse = (first.rounds <= second.rounds
+                 and first.coverage >= second.coverage
+                 and first.balance >= second.balance)
+    better = (first.rounds < second.rounds
+              or first.coverage > second.coverage
+              or first.balance > second.balance)
+    return not_worse and better
+
+
+@functools.lru_cache(maxsize=256)
+def advise_configurations(
+        participants_count: int,
+        min_seats: int = MIN_SEATS,
+        max_seats: int = MAX_SEATS) -> Tuple[ConfigurationOption, ...]:
+    """
+    Подбирает конфигурации столов и мест моделированием сессии для полного состава
+    и возвращает Парето-оптимальные по числу раундов, покрытию пар и балансу столов.
+    Для каждого числа мест берется наименьшее число столов, рассаживающее всех.
+    Бюджет моделирования SIMULATION_TIME_MS делится между вариантами.
+    Результат кэшируется по числу участников
+
+    :param participants_count: Количество участников
+    :param min_seats: Наименьшее число мест за столом
+    :param max_seats: Наибольшее число мест за столом
+    :return: Варианты по возрастанию числа раундов
+    """
+    if participants_count < 2:
+        return ()
+    seat_options = range(max(min_seats, 2), min(max_seats, participants_count) + 1)
+    time_budget_ms = SIMULATION_TIME_MS / max(1, len(seat_options))
+    options = list(dict.fromkeys(
+        _evaluate_configuration(participants_count, seats, time_budget_ms)
+        for seats in seat_options))
+    if participants_count > max_seats:
+        pareto = [option for option in options
+                  if not any(_dominates(other, option) for other in options)]
+    else:
+        # Все помещаются за один стол: одного раунда достаточно
+        pareto = [_evaluate_configuration(participants_count, participants_count, time_budget_ms)]
+    return tuple(sorted(pareto, key=lambda option: (option.rounds, -option.coverage, -option.balance)))
+
+
+def recommend_configuration(participants_count: int) -> Optional[ConfigurationOption]:
+    """
+    Рекомендуемая конфигурация: наименьшее число раундов на единицу покрытия
+    среди вариантов с балансом столов не ниже MIN_BALANCE
+
+    :param participants_count: Количество участников
+    :return: Вариант рассадки или None, если участников меньше двух
+    """
+    options = advise_configurations(participants_count)
+    if not options:
+        return None
+    suitable = [option for option in options if option.balance >= MIN_BALANCE] or list(options)
+    return min(suitable, key=lambda option: (option.rounds / option.coverage, -option.balance))
+
+
+def get_ideal_tables_and_seats(n: int) -> Tuple[int, int]:
+    """
+    Столы и места рекомендуемой конфигурации (recommend_configuration)
+
+    :param n: Количество участников
+    :return: (столы, места)
+    """
+    if n <= 0:
+        return (0, 0)
+    option = recommend_configuration(n)
+    if option is None:
+        return (1, n)
+    return option.tables, option.seats
@@ -0,0 +1,401 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from bin.session import (
+    SessionScheduler,
+    PairBackend,
+    SearchEngine,
+    ENGINE_VERSION,
+    get_max_rounds,
+    get_round_lower_bounds,
+    split_into_tables
+)
+
+# Конфигурации набора тестов производительности планировщика.
+# rounds - ограничение числа раундов для больших сессий, где полное покрытие требует сотен раундов
+BENCHMARK_SUITE = [
+    {'participants': 10, 'tables': 2, 'seats': 5},
+    {'participants': 12, 'tables': 4, 'seats': 3},
+    {'participants': 16, 'tables': 4, 'seats': 4},
+    {'participants': 30, 'tables': 6, 'seats': 5},
+    {'participants': 61, 'tables': 8, 'seats': 8},
+    {'participants': 100, 'tables': 20, 'seats': 5},
+    {'participants': 300, 'tables': 50, 'seats': 6, 'rounds': 20},
+    {'participants': 1000, 'tables': 125, 'seats': 8, 'rounds': 10},
+    {'participants': 3000, 'tables': 500, 'seats': 6, 'rounds': 5}
+]
+
+
+def _generate_round_quietly(scheduler: SessionScheduler, attempts: int):
+    """
+    Генерирует раунд без отладочного вывода планировщика
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return scheduler.generate_next_round(attempts=attempts)
+
+
+def benchmark_parallel_search(
+        participants: int = 300,
+        tables: int = 50,
+        seats: int = 6,
+        attempts: int = 400,
+        rounds: int = 3,
+        engine: str = SearchEngine.random.value):
+    """
+    Измеряет ускорение параллельного поиска рассадки в зависимости от числа процессов
+
+    :param participants: Количество участников
+    :param tables: Количество столов
+    :param seats: Количество мест за столом
+    :param attempts: Количество попыток на раунд
+    :param rounds: Количество измеряемых раундов
+    :param engine: Алгоритм поиска рассадки (SearchEngine)
+    :return: Список словарей с результатами для каждого числа процессов
+    """
+    cpu_count = os.cpu_count() or 1
+    workers_options = sorted({1, *[2 ** i for i in range(1, cpu_count.bit_length()) if 2 ** i <= cpu_count], cpu_count})
+
+    results = []
+    baseline = None
+    print(f"\n=== ПАРАЛЛЕЛЬНЫЙ ПОИСК: {participants} участников, {tables} столов по {seats} мест, {attempts} попыток ===")
+    for workers in workers_options:
+        scheduler = SessionScheduler(
+            participants=list(range(1, participants + 1)),
+            n=tables,
+            m=seats,
+            pair_backend=PairBackend.matrix.value,
+            engine=engine,
+            workers=workers
+        )
+        # Первый раунд прогревает пул процессов и не учитывается
+        _generate_round_quietly(scheduler, attempts)
+
+        started = time.perf_counter()
+        for _ in range(rounds):
+            _generate_round_quietly(scheduler, attempts)
+        per_round = (time.perf_counter() - started) / rounds
+        scheduler.close()
+
+        baseline = baseline or per_round
+        result = {
+            'workers': workers,
+            'seconds_per_round': per_round,
+            'speedup': baseline / per_round,
+            'met_pairs': scheduler.get_met_pairs_count()
+        }
+        results.append(result)
+        print(f"Процессов: {workers:3d}  раунд: {per_round:.3f} с  ускорение: {result['speedup']:.2f}x")
+    return results
+
+
+
+def benchmark_split_into_tables(
+        sizes=(10, 50, 100, 500, 1000, 2000, 5000),
+        seats: int = 6,
+        calls: int = 200):
+    """
+    Измеряет время одного вызова split_into_tables в зависимости от числа участников.
+    При линейной сложности время на одного участника не растет
+
+    :param sizes: Количества участников
+    :param seats: Количество мест за столом
+    :param calls: Количество вызовов для каждого размера
+    :return: Список словарей с результатами для каждого размера
+    """
+    rng = random.Random(42)
+    results = []
+    print(f"\n=== РАЗБИЕНИЕ ПО СТОЛАМ: {seats} мест за столом, {calls} вызовов ===")
+    for participants in sizes:
+        people = list(range(1, participants + 1))
+        tables = (participants + seats - 1) // seats
+
+        started = time.perf_counter()
+        for _ in range(calls):
+            split_into_tables(people, tables, seats, rng=rng)
+        per_call = (time.perf_counter() - started) / calls
+
+        result = {
+            'participants': participants,
+            'microseconds_per_call': per_call * 1e6,
+            'nanoseconds_per_participant': per_call * 1e9 / participants
+        }
+        results.append(result)
+        print(f"Участников: {participants:5d}  вызов: {result['microseconds_per_call']:9.1f} мкс  "
+              f"на участника: {result['nanoseconds_per_participant']:6.0f} нс")
+    return results
+
+
+
+def benchmark_scheduler(
+        participants: int,
+        tables: int,
+        seats: int,
+        rounds: Optional[int] = None,
+        engine: str = SearchEngine.batch.value,
+        pair_backend: str = PairBackend.matrix.value,
+        attempts: Optional[int] = None,
+        deadline_ms: Optional[int] = None,
+        seed: int = 42,
+        track_memory: bool = True) -> Dict:
+    """
+    Проводит одну сессию до полного покрытия пар, невозможности создать раунд
+    или ограничения rounds и собирает метрики каждого раунда
+
+    :param participants: Количество участников
+    :param tables: Количество столов
+    :param seats: Количество мест за столом
+    :param rounds: Ограничение числа раундов, по умолчанию удвоенный get_max_rounds
+    :param engine: Алгоритм поиска рассадки (SearchEngine)
+    :param pair_backend: Хранилище встреченных пар (PairBackend)
+    :param attempts: Количество попыток поиска на раунд, по умолчанию как в generate_next_round
+    :param deadline_ms: Срок поиска раунда в миллисекундах. Без срока результаты
+        воспроизводимы и пригодны для сравнения покрытия между версиями
+    :param seed: Зерно генератора случайных чисел планировщика
+    :param track_memory: Измерять пиковую память через tracemalloc (замедляет раунды)
+    :return: Словарь с параметрами и результатами сессии
+    """
+    max_rounds = get_max_rounds(participants, seats)
+    rounds_limit = rounds if rounds is not None else 2 * max_rounds
+
+    if track_memory:
+        tracemalloc.start()
+        memory_baseline = tracemalloc.get_traced_memory()[0]
+    peak_memory = 0
+
+    started = time.perf_counter()
+    scheduler = SessionScheduler(
+        participants=list(range(1, participants + 1)),
+        n=tables,
+        m=seats,
+        pair_backend=pair_backend,
+        engine=engine,
+        seed=seed
+    )
+    scheduler.verbose = False
+    # Планировщик сам останавливается на своем пределе раундов (около get_max_rounds),
+    # а бенчмарк идет до полного покрытия или rounds_limit
+    scheduler._max_rounds = max(scheduler._max_rounds, rounds_limit)
+    setup_ms = (time.perf_counter() - started) * 1000
+
+    per_round = []
+    rounds_to_full_coverage = None
+    while len(per_round) < rounds_limit:
+        if track_memory:
+            peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1] - memory_baseline)
+            tracemalloc.reset_peak()
+
+        started = time.perf_counter()
+        round_dict = scheduler.generate_next_round(attempts=attempts, deadline_ms=deadline_ms)
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        if track_memory:
+            peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1] - memory_baseline)
+        if round_dict is None:
+            break
+
+        report = scheduler.last_search_report or {}
+        coverage = scheduler.get_coverage_percentage()
+        per_round.append({
+            'round': len(per_round) + 1,
+            'latency_ms': latency_ms,
+            'coverage': coverage,
+            'met_pairs': scheduler.get_met_pairs_count(),
+            'source': report.get('source'),
+            'stop_reason': report.get('stop_reason'),
+            'attempts': report.get('attempts')
+        })
+        if coverage >= 1.0:
+            rounds_to_full_coverage = len(per_round)
+            break
+
+    if track_memory:
+        tracemalloc.stop()
+
+    repeated = scheduler.check_repeated_meetings()
+    stats = scheduler.get_session_stats()
+    latencies = [item['latency_ms'] for item in per_round]
+    result = {
+        'participants': participants,
+        'tables': tables,
+        'seats': seats,
+        'engine': engine,
+        'pair_backend': pair_backend,
+        'seed': seed,
+        'setup_ms': setup_ms,
+        'rounds': len(per_round),
+        'max_rounds': max_rounds,
+        'rounds_lower_bound': get_round_lower_bounds(participants, tables, seats)['best'],
+        'optimality_gap': stats['optimality_gap'],
+        'rounds_to_full_coverage': rounds_to_full_coverage,
+        # Полное покрытие не достигнуто за rounds_limit раундов
+        'rounds_capped': rounds_to_full_coverage is None and len(per_round) >= rounds_limit,
+        'rounds_limit': rounds_limit,
+        'final_coverage': per_round[-1]['coverage'] if per_round else 0.0,
+        'repeated_pairs': repeated['repeated_pairs'],
+        'total_repeated_meetings': repeated['total_repeated_meetings'],
+        'latency_ms': {
+            'mean': float(np.mean(latencies)) if latencies else None,
+            'p50': float(np.percentile(latencies, 50)) if latencies else None,
+            'p95': float(np.percentile(latencies, 95)) if latencies else None,
+            'max': max(latencies) if latencies else None
+        },
+        'peak_memory_bytes': peak_memory if track_memory else None,
+        'per_round': per_round
+    }
+    scheduler.close()
+    return result
+
+
+def run_benchmark_suite(
+        configs: List[Dict] = None,
+        repeats: int = 1,
+        output_path: Optional[str] = None,
+        **options) -> Dict:
+    """
+    Прогоняет набор конфигураций планировщика и сохраняет результаты в JSON,
+    пригодный для сравнения версий через compare_benchmark_results
+
+    :param configs: Конфигурации участников, столов и мест, по умолчанию BENCHMARK_SUITE
+    :param repeats: Количество повторов каждой конфигурации с разными зернами
+    :param output_path: Путь к файлу результатов, None - не сохранять
+    :param options: Дополнительные параметры benchmark_scheduler
+    :return: Словарь с описанием окружения и результатами
+    """
+    configs = configs or BENCHMARK_SUITE
+    base_seed = options.pop('seed', 42)
+
+    results = []
+    print(f"\n=== НАБОР ТЕСТОВ ПЛАНИРОВЩИКА: {len(configs)} конфигураций, повторов: {repeats} ===")
+    for config in configs:
+        for repeat in range(repeats):
+            result = benchmark_scheduler(**config, **options, seed=base_seed + repeat)
+            result['repeat'] = repeat
+            results.append(result)
+            full = result['rounds_to_full_coverage']
+            if full is None:
+                full = f">{result['rounds_limit']}" if result['rounds_capped'] else '-'
+            print(f"{result['participants']:5d} уч. {result['tables']:4d}x{result['seats']:<2d}  "
+                  f"раундов: {result['rounds']:3d} (макс. {result['max_rounds']:3d}, полное покрытие: {full})  "
+                  f"покрытие: {result['final_coverage'] * 100:5.1f}%  повторов: {result['repeated_pairs']:4d}  "
+                  f"раунд p50: {result['latency_ms']['p50'] or 0:8.1f} мс  "
+                  f"память: {(result['peak_memory_bytes'] or 0) / 2 ** 20:7.1f} МБ")
+
+    report = {
+        'engine_version': ENGINE_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'options': options,
+        'results': results
+    }
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {output_path}")
+    return report
+
+
+def compare_benchmark_results(
+        baseline: Dict,
+        current: Dict,
+        latency_tolerance: float = 0.25,
+        memory_tolerance: float = 0.25) -> List[str]:
+    """
+    Сравнивает результаты двух прогонов run_benchmark_suite и находит регрессии:
+    меньшее покрытие, больше раундов до полного покрытия, больше повторных встреч,
+    рост медианной задержки раунда или пиковой памяти сверх допуска
+
+    :param baseline: Результаты базовой версии
+    :param current: Результаты проверяемой версии
+    :param latency_tolerance: Допустимый относительный рост задержки
+    :param memory_tolerance: Допустимый относительный рост памяти
+    :return: Список описаний регрессий
+    """
+    def key(result):
+        return (result['participants'], result['tables'], result['seats'],
+                result['engine'], result['pair_backend'], result.get('repeat', 0))
+
+    baseline_results = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        before = baseline_results.get(key(result))
+        if before is None:
+            continue
+        name = f"{result['participants']} уч. {result['tables']}x{result['seats']} {result['engine']}"
+
+        if result['final_coverage'] + 1e-9 < before['final_coverage']:
+            regressions.append(
+                f"{name}: покрытие {before['final_coverage'] * 100:.1f}% -> {result['final_coverage'] * 100:.1f}%")
+        before_full = before['rounds_to_full_coverage']
+        current_full = result['rounds_to_full_coverage']
+        if before_full is not None and (current_full is None or current_full > before_full):
+            regressions.append(f"{name}: раундов до полного покрытия {before_full} -> {current_full}")
+        if result['repeated_pairs'] > before['repeated_pairs']:
+            regressions.append(f"{name}: повторных пар {before['repeated_pairs']} -> {result['repeated_pairs']}")
+
+        before_latency = before['latency_ms']['p50']
+        current_latency = result['latency_ms']['p50']
+        if before_latency and current_latency and current_latency > before_latency * (1 + latency_tolerance):
+            regressions.append(f"{name}: задержка раунда {before_latency:.1f} -> {current_latency:.1f} мс")
+
+        before_memory = before.get('peak_memory_bytes')
+        current_memory = result.get('peak_memory_bytes')
+        if before_memory and current_memory and current_memory > before_memory * (1 + memory_tolerance):
+            regressions.append(f"{name}: пиковая память {before_memory} -> {current_memory} байт")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Тесты производительности планировщика рассадки')
+    parser.add_argument('benchmark', nargs='?', default='suite', choices=['suite', 'split', 'parallel'])
+    parser.add_argument('--output', help='Файл для результатов набора тестов в формате JSON')
+    parser.add_argument('--baseline', help='Файл с результатами базовой версии для поиска регрессий')
+    parser.add_argument('--max-participants', type=int, default=None, help='Пропустить конфигурации крупнее')
+    parser.add_argument('--repeats', type=int, default=1)
+    parser.add_argument('--engine', default=SearchEngine.batch.value)
+    parser.add_argument('--attempts', type=int, default=None)
+    parser.add_argument('--deadline-ms', type=int, default=None)
+    parser.add_argument('--no-memory', action='store_true', help='Не измерять память (точнее задержки)')
+    args = parser.parse_args()
+
+    if args.benchmark == 'split':
+        benchmark_split_into_tables()
+        return
+    if args.benchmark == 'parallel':
+        benchmark_parallel_search()
+        return
+
+    configs = [config for config in BENCHMARK_SUITE
+               if args.max_participants is None or config['participants'] <= args.max_participants]
+    report = run_benchmark_suite(
+        configs,
+        repeats=args.repeats,
+        output_path=args.output,
+        engine=args.engine,
+        attempts=args.attempts,
+        deadline_ms=args.deadline_ms,
+        track_memory=not args.no_memory)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as baseline_file:
+            regressions = compare_benchmark_results(json.load(baseline_file), report)
+        print(f"\nРегрессий относительно {args.baseline}: {len(regressions)}")
+        for regression in regressions:
+            print(f"- {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
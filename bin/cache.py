@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+from typing import List, Optional, Dict
+
+
+DEFAULT_CACHE_DIR = os.environ.get('SCHEDULE_CACHE_DIR', '.schedule_cache')
+CACHE_FORMAT_VERSION = 1
+
+
+class ScheduleCache:
+    '''
+    Дисковый кэш рассчитанных расписаний сессии.
+
+    Расписание хранится в переобозначаемом виде: раунд - список номеров столов
+    по позициям участников (-1 - участник не рассажен), поэтому его можно
+    применить к любому составу того же размера. Ключ - (число участников,
+    столы, места, зерно, версия алгоритма). Каждая запись проверяется по
+    контрольной сумме и ограничениям рассадки, поврежденные записи удаляются.
+    Самые давно использованные записи вытесняются при превышении лимитов
+
+    :param directory: Каталог кэша
+    :param max_entries: Максимальное количество записей
+    :param max_bytes: Максимальный суммарный размер записей в байтах
+    '''
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def _key_fields(participants_count: int, tables: int, seats: int, seed: int, engine_version: str) -> Dict:
+        return {
+            'format': CACHE_FORMAT_VERSION,
+            'participants': participants_count,
+            'tables': tables,
+            'seats': seats,
+            'seed': seed,
+            'engine_version': engine_version
+        }
+
+    @staticmethod
+    def _checksum(rounds: List[List[int]]) -> str:
+        return hashlib.sha256(json.dumps(rounds, separators=(',', ':')).encode()).hexdigest()
+
+    def _path(self, key_fields: Dict) -> str:
+        name = hashlib.sha256(json.dumps(key_fields, sort_keys=True).encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def get(self, participants_count: int, tables: int, seats: int, seed: int, engine_version: str) -> Optional[List[List[int]]]:
+        """
+        Найти расписание в кэше
+
+        :return: Список раундов с номерами столов по позициям участников или None
+        """
+        key_fields = self._key_fields(participants_count, tables, seats, seed, engine_version)
+        path = self._path(key_fields)
+        try:
+            with open(path, 'r') as cache_file:
+                entry = json.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"[DEBUG] Поврежденная запись кэша расписаний {path}: {e}")
+            self._remove(path)
+            return None
+
+        rounds = entry.get('rounds') if isinstance(entry, dict) else None
+        if (rounds is None
+                or entry.get('key') != key_fields
+                or not self._is_valid(rounds, participants_count, tables, seats)
+                or entry.get('checksum') != self._checksum(rounds)):
+            print(f"[DEBUG] Запись кэша расписаний {path} не прошла проверку целостности")
+            self._remove(path)
+            return None
+
+        # Обновляем время использования для вытеснения давно не использованных записей
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return rounds
+
+    def put(self, participants_count: int, tables: int, seats: int, seed: int, engine_version: str, rounds: List[List[int]]):
+        """
+        Сохранить расписание в кэш
+
+        :param rounds: Список раундов с номерами столов по позициям участников
+        """
+        if not self._is_valid(rounds, participants_count, tables, seats):
+            raise ValueError("Расписание не соответствует ограничениям рассадки")
+
+        key_fields = self._key_fields(participants_count, tables, seats, seed, engine_version)
+        path = self._path(key_fields)
+        entry = {'key': key_fields, 'rounds': rounds, 'checksum': self._checksum(rounds)}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Пишем во временный файл и атомарно переименовываем
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as cache_file:
+                json.dump(entry, cache_file, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[DEBUG] Не удалось сохранить расписание в кэш: {e}")
+            return
+        self._evict()
+
+    def clear(self):
+        """
+        Удалить все записи кэша
+        """
+        for path in self._entries():
+            self._remove(path)
+
+    @staticmethod
+    def _is_valid(rounds, participants_count: int, tables: int, seats: int) -> bool:
+        if not isinstance(rounds, list):
+            return False
+        for round_tables in rounds:
+            if not isinstance(round_tables, list) or len(round_tables) != participants_count:
+                return False
+            sizes = {}
+            for table_idx in round_tables:
+                if not isinstance(table_idx, int) or table_idx < -1 or table_idx >= tables:
+                    return False
+                if table_idx >= 0:
+                    sizes[table_idx] = sizes.get(table_idx, 0) + 1
+            if any(size < 2 or size > max(seats, 2) for size in sizes.values()):
+                return False
+        return True
+
+    def _entries(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in names if name.endswith('.json')]
+
+    def _evict(self):
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            total_bytes -= size
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
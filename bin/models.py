@@ -23,8 +23,10 @@ class UserInfo:
     :param table: Стол, за которым пользователь сидит
     :param message_id: ID последнего сообщения с номером стола
     :param is_mock: Флаг, указывающий является ли пользователь моком
+    :param user_id: ID пользователя в Telegram (у мок-пользователей отрицательный)
     '''
-    def __init__(self, table_num: int = 0, username: str = None, user_state : UserState = UserState.default.value, message_id: int = None, is_mock: bool = False):
+    def __init__(self, table_num: int = 0, username: str = None, user_state : UserState = UserState.default.value, message_id: int = None, is_mock: bool = False, user_id: int = None):
+        self.user_id = user_id
         self.username = username
         self.table_num = table_num
         self.message_id = message_id
@@ -39,6 +41,7 @@ class UserInfo:
 
     def to_dict(self):
         return {
+            "id": self.user_id,
             "name": self.username,
             "initials": self.initials,
             "table_index": self.table_num,
@@ -52,8 +55,8 @@ class MockUserInfo(UserInfo):
     '''
     Класс для мок-пользователей, которые используются для тестирования
     '''
-    def __init__(self, username: str, table_num: int = 0):
-        super().__init__(username=username, table_num=table_num, message_id=None, is_mock=True)
+    def __init__(self, username: str, table_num: int = 0, user_id: int = None):
+        super().__init__(username=username, table_num=table_num, message_id=None, is_mock=True, user_id=user_id)
 
 
 class Metrics:
@@ -0,0 +1,310 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from enum import Enum
+from typing import Dict, Iterator, List, Optional
+
+from bin.cache import ScheduleCache
+from bin.session import SessionScheduler, PairBackend, SearchEngine, estimate_session_memory
+
+
+class SessionState(Enum):
+    active = "ACTIVE"
+    finished = "FINISHED"
+
+
+class _SessionEntry:
+    """
+    Планировщик сессии и служебное состояние реестра для нее
+    """
+    def __init__(self, scheduler: SessionScheduler):
+        self.scheduler = scheduler
+        self.state = SessionState.active
+        self.finished_at: Optional[float] = None
+        # Работа над одной сессией выполняется последовательно, над разными - параллельно
+        self.lock = threading.Lock()
+        # Фоновые задачи сессии выполняются по одной в порядке постановки
+        self.pending = deque()
+        self.draining = False
+        self.queue_lock = threading.Lock()
+
+
+class SessionRegistry:
+    '''
+    Реестр сессий для нескольких одновременных мероприятий в одном процессе.
+
+    У каждой сессии свой планировщик со своим генератором случайных чисел и
+    состоянием. Память сессии ограничена: число участников не может превысить
+    значение, при котором оценка памяти сессии (estimate_session_memory)
+    превышает max_session_bytes. Завершенные сессии вытесняются через
+    finished_ttl_s секунд или раньше, если сессий больше max_sessions.
+    Раунды разных сессий рассчитываются параллельно в потоках, а
+    параллельный поиск рассадки всех сессий использует общий пул процессов
+
+    :param workers: Размер общего пула процессов. По умолчанию 1 - без пула:
+        параллельный поиск включается явно, например workers=os.cpu_count()
+    :param max_sessions: Максимальное количество сессий в реестре
+    :param max_session_bytes: Ограничение памяти одной сессии в байтах
+    :param finished_ttl_s: Сколько секунд хранить завершенную сессию
+    :param concurrent_rounds: Сколько сессий могут рассчитывать раунды одновременно
+    :param schedule_cache: Дисковый кэш планов, общий для всех сессий
+    '''
+    def __init__(
+            self,
+            workers: int = 1,
+            max_sessions: int = 16,
+            max_session_bytes: int = 256 * 1024 * 1024,
+            finished_ttl_s: float = 3600,
+            concurrent_rounds: int = 4,
+            schedule_cache: Optional[ScheduleCache] = None):
+        self.workers = max(1, workers)
+        self.max_sessions = max_sessions
+        self.max_session_bytes = max_session_bytes
+        self.finished_ttl_s = finished_ttl_s
+        self.schedule_cache = schedule_cache
+        self._sessions: Dict[str, _SessionEntry] = {}
+        self._lock = threading.Lock()
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool = ThreadPoolExecutor(max_workers=concurrent_rounds, thread_name_prefix='session')
+
+    def _get_process_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 1:
+            return None
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._process_pool
+
+    def max_participants(self, seats_per_table: int) -> int:
+        """
+        Наибольшее число участников, при котором сессия укладывается в max_session_bytes
+
+        :param seats_per_table: Количество мест за столом
+        :return: Количество участников
+        """
+        low, high = 0, 2
+        while estimate_session_memory(high, seats_per_table) <= self.max_session_bytes:
+            low, high = high, high * 2
+        while high - low > 1:
+            middle = (low + high) // 2
+            if estimate_session_memory(middle, seats_per_table) <= self.max_session_bytes:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def create(self, session_id: str, participants: List[int], n: int, m: int, **options) -> SessionScheduler:
+        """
+        Создает сессию. Существующая сессия с тем же id закрывается и заменяется
+
+        :param session_id: Идентификатор сессии (зала)
+        :param participants: Список участников
+        :param n: Количество столов
+        :param m: Количество мест за столом
+        :param options: Дополнительные параметры SessionScheduler
+        :return: Планировщик сессии
+        """
+        options.setdefault('pair_backend', PairBackend.matrix.value)
+        options.setdefault('engine', SearchEngine.batch.value)
+        options.setdefault('schedule_cache', self.schedule_cache)
+        options.setdefault('workers', self.workers)
+        options.setdefault('max_participants', self.max_participants(m))
+        if options['workers'] > 1:
+            options.setdefault('executor', self._get_process_pool())
+        scheduler = SessionScheduler(participants, n, m, **options)
+
+        with self._lock:
+            self._evict_locked()
+            replaced = self._sessions.pop(session_id, None)
+            if len(self._sessions) >= self.max_sessions:
+                scheduler.close()
+                raise RuntimeError(f"Достигнуто максимальное количество сессий: {self.max_sessions}")
+            self._sessions[session_id] = _SessionEntry(scheduler)
+        if replaced is not None:
+            replaced.scheduler.close()
+        print(f"[DEBUG] Создана сессия {session_id}: {len(scheduler.participants)} участников, "
+              f"не больше {options['max_participants']} участников")
+        return scheduler
+
+    def get(self, session_id: str) -> Optional[SessionScheduler]:
+        entry = self._sessions.get(session_id)
+        return entry.scheduler if entry else None
+
+    def _entry(self, session_id: str) -> _SessionEntry:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            raise KeyError(f"Сессия {session_id} не найдена")
+        return entry
+
+    @contextmanager
+    def locked(self, session_id: str) -> Iterator[SessionScheduler]:
+        """
+        Планировщик сессии для изменения состава, числа столов или мест: изменения
+        ждут завершения фоновых задач сессии (например, расчета плана), чтобы
+        не менять планировщик посреди их работы
+
+        :param session_id: Идентификатор сессии
+        :return: Контекстный менеджер с планировщиком сессии
+        """
+        entry = self._entry(session_id)
+        with entry.lock:
+            yield entry.scheduler
+
+    def generate_next_round(self, session_id: str, **kwargs) -> Optional[Dict[int, int]]:
+        """
+        Генерирует следующий раунд сессии. Вызовы для одной сессии выполняются по очереди
+
+        :param session_id: Идентификатор сессии
+        :param kwargs: Параметры SessionScheduler.generate_next_round
+        :return: Словарь {участник: номер_стола} или None
+        """
+        entry = self._entry(session_id)
+        with entry.lock:
+            return entry.scheduler.generate_next_round(**kwargs)
+
+    def plan_session(self, session_id: str, **kwargs) -> List[Dict[int, int]]:
+        """
+        Рассчитывает раунды сессии заранее (SessionScheduler.plan_session)
+
+        :param session_id: Идентификатор сессии
+        :param kwargs: Параметры SessionScheduler.plan_session
+        :return: Список запланированных раундов
+        """
+        entry = self._entry(session_id)
+        with entry.lock:
+            return entry.scheduler.plan_session(**kwargs)
+
+    def submit_next_round(self, session_id: str, **kwargs) -> Future:
+        """
+        Запускает генерацию раунда в фоне: раунды разных сессий считаются одновременно,
+        а раунды одной сессии - по очереди в порядке вызовов
+
+        :return: Future со словарем {участник: номер_стола} или None
+        """
+        return self._submit(session_id, SessionScheduler.generate_next_round, kwargs)
+
+    def submit_plan_session(self, session_id: str, **kwargs) -> Future:
+        """
+        Запускает расчет плана сессии в фоне
+
+        :return: Future со списком запланированных раундов
+        """
+        return self._submit(session_id, SessionScheduler.plan_session, kwargs)
+
+    def _submit(self, session_id: str, method, kwargs: Dict) -> Future:
+        """
+        Ставит задачу в очередь сессии. Очередь разбирает один поток общего пула,
+        поэтому сессия не занимает больше одного потока
+        """
+        entry = self._entry(session_id)
+        future = Future()
+        with entry.queue_lock:
+            entry.pending.append((future, method, kwargs))
+            if entry.draining:
+                return future
+            entry.draining = True
+        self._thread_pool.submit(self._drain, entry)
+        return future
+
+    @staticmethod
+    def _drain(entry: _SessionEntry):
+        while True:
+            with entry.queue_lock:
+                if not entry.pending:
+                    entry.draining = False
+                    return
+                future, method, kwargs = entry.pending.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with entry.lock:
+                    result = method(entry.scheduler, **kwargs)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def finish(self, session_id: str):
+        """
+        Отмечает сессию завершенной. Ее статистика доступна до вытеснения
+        """
+        entry = self._sessions.get(session_id)
+        if entry is None or entry.state == SessionState.finished:
+            return
+        entry.state = SessionState.finished
+        entry.finished_at = time.monotonic()
+        with self._lock:
+            self._evict_locked()
+
+    def remove(self, session_id: str):
+        """
+        Удаляет сессию из реестра и освобождает ее ресурсы
+        """
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            entry.scheduler.close()
+
+    def evict(self) -> List[str]:
+        """
+        Вытесняет завершенные сессии по сроку хранения и по лимиту количества сессий
+
+        :return: Список вытесненных сессий
+        """
+        with self._lock:
+            return self._evict_locked()
+
+    def _evict_locked(self) -> List[str]:
+        now = time.monotonic()
+        finished = sorted(
+            (entry.finished_at, session_id)
+            for session_id, entry in self._sessions.items()
+            if entry.state == SessionState.finished)
+        evicted = []
+        for finished_at, session_id in finished:
+            # Самые давно завершенные вытесняются первыми, пока реестр переполнен
+            if now - finished_at < self.finished_ttl_s and len(self._sessions) < self.max_sessions:
+                break
+            self._sessions.pop(session_id).scheduler.close()
+            evicted.append(session_id)
+        if evicted:
+            print(f"[DEBUG] Вытеснены завершенные сессии: {evicted}")
+        return evicted
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """
+        Состояние всех сессий: статус, участники, раунды и память
+
+        :return: Словарь {id сессии: статистика}
+        """
+        return {
+            session_id: {
+                'state': entry.state.value,
+                'participants': len(entry.scheduler.participants),
+                'rounds': len(entry.scheduler.rounds),
+                'memory_bytes': entry.scheduler.get_memory_usage(),
+                'max_participants': entry.scheduler.max_participants
+            }
+            for session_id, entry in list(self._sessions.items())
+        }
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def close(self):
+        """
+        Закрывает все сессии и останавливает общие пулы
+        """
+        with self._lock:
+            entries = list(self._sessions.values())
+            self._sessions.clear()
+        for entry in entries:
+            entry.scheduler.close()
+        self._thread_pool.shutdown()
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+            self._process_pool = None
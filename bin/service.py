@@ -1,56 +1,537 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
-from typing import List, Dict, Set, FrozenSet
+from typing import Any, Callable, List, Dict, Optional, Tuple
+from collections import deque
+from enum import Enum
 from bin.models import UserInfo
-import math
-import itertools
+import random
+import threading
+import time
 
-class AppService:
-    def __init__(self, base_url = "http://api:5050/api"):
-        self.base_url = base_url
-        self._met_pairs: Set[FrozenSet[int]] = set()  # Множество для хранения всех встретившихся пар
-    
-    def _get_all_possible_pairs(self, total_participants: int) -> Set[FrozenSet[int]]:
+# Таймауты (подключение, чтение) в секундах по эндпоинтам API
+ENDPOINT_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    '/users': (3.05, 10),
+    '/metrics': (3.05, 10),
+    '/start': (3.05, 5),
+    '/stop': (3.05, 5)
+}
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Повторы запроса при ошибках подключения и ответах 5xx: все запросы к API идемпотентны
+# (заменяют состояние целиком), поэтому их можно безопасно повторять. Таймаут чтения
+# не повторяется: API уже получил запрос, а повтор лишь умножил бы ожидание
+MAX_RETRIES = 2
+RETRY_STATUSES = {500, 502, 503, 504}
+BACKOFF_BASE_S = 0.2
+BACKOFF_MAX_S = 2.0
+
+# Количество соединений keep-alive в пуле
+POOL_SIZE = 4
+
+# Сколько последних отправок учитывается в статистике задержки фоновой отправки
+LATENCY_WINDOW = 100
+
+# Предохранитель: после FAILURE_THRESHOLD неудачных запросов подряд запросы к API
+# не выполняются COOLDOWN_S секунд, затем выполняется один пробный запрос
+FAILURE_THRESHOLD = 3
+COOLDOWN_S = 15.0
+
+# Пауза перед повторной отправкой отложенных обновлений: растет вдвое с каждой
+# неудачей подряд, но не больше паузы предохранителя, даже пока он замкнут
+REPLAY_BACKOFF_BASE_S = 1.0
+
+
+class CircuitState(Enum):
+    closed = "CLOSED"
+    open = "OPEN"
+    half_open = "HALF_OPEN"
+
+
+class CircuitOpenError(requests.RequestException):
+    """
+    Запрос не выполнялся: предохранитель разомкнут, API считается недоступным
+    """
+
+
+def _is_api_unavailable(error: Exception) -> bool:
+    """
+    Ошибка означает недоступность API (сеть, таймаут, 5xx, разомкнутый предохранитель),
+    а не ошибку самого запроса: только такие обновления имеет смысл отправить повторно
+    """
+    if isinstance(error, (CircuitOpenError, requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    '''
+    Предохранитель для запросов к API.
+
+    В замкнутом состоянии запросы выполняются как обычно. После failure_threshold
+    неудачных запросов подряд предохранитель размыкается, и запросы сразу
+    отклоняются в течение cooldown_s секунд. Затем он переходит в полуоткрытое
+    состояние и пропускает один пробный запрос: при успехе замыкается, при
+    неудаче снова размыкается на cooldown_s секунд
+
+    :param failure_threshold: Количество неудачных запросов подряд до размыкания
+    :param cooldown_s: Сколько секунд отклонять запросы после размыкания
+    '''
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, cooldown_s: float = COOLDOWN_S):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_s = cooldown_s
+        self.state = CircuitState.closed
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.opened_count = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
         """
-        Вычисляет все возможные пары участников
-        
-        :param total_participants: Общее количество участников
-        :return: Множество всех возможных пар
+        Можно ли выполнить запрос. В полуоткрытом состоянии разрешается только один пробный запрос
+
+        :return: True, если запрос можно выполнять
         """
-        participants = range(1, total_participants + 1)
-        return set(frozenset([i, j]) for i, j in itertools.combinations(participants, 2))
+        with self._lock:
+            if self.state == CircuitState.closed:
+                return True
+            if self.state == CircuitState.open:
+                if time.monotonic() - self.opened_at < self.cooldown_s:
+                    self.rejected += 1
+                    return False
+                self.state = CircuitState.half_open
+                print("[DEBUG] API: пробный запрос после паузы")
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+            return True
 
-    def _update_met_pairs(self, round_tables: Dict[int, List[int]]) -> None:
+    def retry_after(self) -> float:
         """
-        Обновляет множество встретившихся пар на основе текущего раунда
-        
-        :param round_tables: Словарь {номер_стола: [список участников за столом]}
+        Через сколько секунд будет разрешен пробный запрос
+
+        :return: Секунды, 0 - запросы разрешены
         """
-        for table_participants in round_tables.values():
-            # Добавляем все пары участников за текущим столом
-            for i in range(len(table_participants)):
-                for j in range(i + 1, len(table_participants)):
-                    self._met_pairs.add(frozenset([table_participants[i], table_participants[j]]))
+        with self._lock:
+            if self.state != CircuitState.open:
+                return 0.0
+            return max(0.0, self.opened_at + self.cooldown_s - time.monotonic())
 
-    def update_users(self, users: List[UserInfo]):
-        request_body = json.dumps([user.to_dict() for user in users])
+    def record_success(self):
+        with self._lock:
+            if self.state != CircuitState.closed:
+                print("[DEBUG] API снова доступен")
+            self.state = CircuitState.closed
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == CircuitState.half_open or (
+                    self.state == CircuitState.closed and self.failures >= self.failure_threshold):
+                self.state = CircuitState.open
+                self.opened_at = time.monotonic()
+                self.opened_count += 1
+                print(f"[DEBUG] API недоступен после {self.failures} неудачных запросов, "
+                      f"пауза {self.cooldown_s} с")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state.value,
+            'failures': self.failures,
+            'opened_count': self.opened_count,
+            'rejected': self.rejected,
+            'retry_after_s': round(self.retry_after(), 2)
+        }
+
+
+class DashboardDispatcher:
+    '''
+    Фоновая отправка обновлений дашборда.
+
+    submit не блокирует вызывающий поток: обновление кладется в очередь и
+    отправляется отдельным потоком. Очередь хранит по одному обновлению на
+    канал (пользователи, метрики, состояние сессии): новое обновление заменяет
+    еще не отправленное, так как API все равно заменяет состояние целиком.
+    Задержка отправки считается от постановки в очередь самого раннего из
+    объединенных обновлений до ответа API, то есть это время, в течение
+    которого дашборд показывал устаревшие данные.
+
+    Обновление, не отправленное из-за недоступности API, откладывается до его
+    восстановления. Когда предохранитель разрешает пробный запрос и прошла пауза
+    REPLAY_BACKOFF_BASE_S, удваиваемая с каждой неудачей подряд, отложенные
+    обновления ставятся в очередь снова, и после успешной отправки дашборд
+    получает последнее состояние каждого канала. Обновление, отклоненное API
+    (ответ 4xx), не повторяется и учитывается в dropped
 
-        headers = {
+    :param post: Функция отправки (эндпоинт, тело запроса)
+    :param breaker: Предохранитель запросов к API
+    '''
+    def __init__(self, post: Callable[[str, Any], Any], breaker: CircuitBreaker):
+        self._post = post
+        self._breaker = breaker
+        self._pending: Dict[str, Tuple[str, Any, float]] = {}
+        # Обновления, которые не удалось отправить: последнее состояние каждого канала
+        self._deferred: Dict[str, Tuple[str, Any, float]] = {}
+        self._in_flight = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        # Неудачи подряд и момент, раньше которого отложенные обновления не отправляются
+        self._failures = 0
+        self._replay_at = 0.0
+        self._latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self._thread = threading.Thread(target=self._run, name='dashboard-dispatcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, channel: str, endpoint: str, payload: Any = None):
+        """
+        Ставит обновление в очередь, заменяя неотправленное обновление того же канала
+
+        :param channel: Канал обновления ('users', 'metrics', 'session')
+        :param endpoint: Путь эндпоинта API
+        :param payload: Тело запроса
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Фоновая отправка остановлена")
+            previous = self._pending.get(channel) or self._deferred.pop(channel, None)
+            if previous is not None:
+                self.coalesced += 1
+            queued_at = previous[2] if previous is not None else time.monotonic()
+            self._pending[channel] = (endpoint, payload, queued_at)
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    if not self._deferred:
+                        self._condition.wait()
+                        continue
+                    delay = max(self._breaker.retry_after(), self._replay_at - time.monotonic())
+                    if delay > 0:
+                        self._condition.wait(delay)
+                    else:
+                        self._replay_locked()
+                if not self._pending:
+                    return
+                channel = next(iter(self._pending))
+                endpoint, payload, queued_at = self._pending.pop(channel)
+                self._in_flight = 1
+            try:
+                self._post(endpoint, payload)
+            except Exception as e:
+                if not isinstance(e, CircuitOpenError):
+                    print(f"[DEBUG] Не удалось отправить {channel} в фоне: {e}")
+                with self._condition:
+                    self.failed += 1
+                    if not _is_api_unavailable(e):
+                        # API отклонил обновление: повтор получит тот же ответ
+                        self.dropped += 1
+                    elif channel not in self._pending:
+                        # Более новое обновление канала уже в очереди - старое не нужно
+                        self._deferred[channel] = (endpoint, payload, queued_at)
+                        self._failures += 1
+                        self._replay_at = time.monotonic() + min(
+                            self._breaker.cooldown_s, REPLAY_BACKOFF_BASE_S * 2 ** (self._failures - 1))
+            else:
+                with self._condition:
+                    self.sent += 1
+                    self._failures = 0
+                    self._replay_at = 0.0
+                    self._latencies_ms.append((time.monotonic() - queued_at) * 1000)
+                    self._replay_locked()
+            finally:
+                with self._condition:
+                    self._in_flight = 0
+                    self._condition.notify_all()
+
+    def _replay_locked(self):
+        """
+        Возвращает отложенные обновления в очередь, если для канала нет более нового
+        """
+        if not self._deferred:
+            return
+        print(f"[DEBUG] Повторная отправка на дашборд: {list(self._deferred)}")
+        for channel, update in self._deferred.items():
+            self._pending.setdefault(channel, update)
+        self._deferred.clear()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Ждет отправки всех обновлений из очереди. Отложенные до восстановления API
+        обновления не ожидаются
+
+        :param timeout: Наибольшее время ожидания в секундах, None - без ограничения
+        :return: True, если очередь опустела
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Глубина очереди, счетчики отправок и задержка отправки в миллисекундах
+        по последним LATENCY_WINDOW отправкам
+        """
+        with self._condition:
+            latencies = sorted(self._latencies_ms)
+            return {
+                'queue_depth': len(self._pending),
+                'in_flight': self._in_flight,
+                'deferred': len(self._deferred),
+                'sent': self.sent,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'coalesced': self.coalesced,
+                'last_flush_latency_ms': round(self._latencies_ms[-1], 2) if latencies else None,
+                'avg_flush_latency_ms': round(sum(latencies) / len(latencies), 2) if latencies else None,
+                'p95_flush_latency_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2) if latencies else None,
+                'max_flush_latency_ms': round(latencies[-1], 2) if latencies else None
+            }
+
+    def close(self, timeout: Optional[float] = None):
+        """
+        Отправляет оставшиеся обновления и останавливает поток отправки
+
+        :param timeout: Наибольшее время ожидания отправки в секундах
+        """
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+
+class AppService:
+    '''
+    Клиент API дашборда
+
+    :param base_url: Адрес API
+    :param timeouts: Таймауты по эндпоинтам, дополняют ENDPOINT_TIMEOUTS
+    :param max_retries: Количество повторов запроса
+    :param background: Отправлять обновления в фоне через DashboardDispatcher,
+        не блокируя вызывающий поток. Иначе запросы выполняются сразу
+    :param failure_threshold: Неудачных запросов подряд до размыкания предохранителя
+    :param cooldown_s: Пауза предохранителя в секундах
+    '''
+    def __init__(self, base_url = "http://api:5050/api", timeouts: Optional[Dict[str, Tuple[float, float]]] = None, max_retries: int = MAX_RETRIES, background: bool = True, failure_threshold: int = FAILURE_THRESHOLD, cooldown_s: float = COOLDOWN_S):
+        self.base_url = base_url
+        self.timeouts = {**ENDPOINT_TIMEOUTS, **(timeouts or {})}
+        self.max_retries = max_retries
+        self._random = random.Random()
+        # Одно HTTP-соединение с пулом keep-alive на весь сервис вместо нового TCP-подключения на каждый запрос
+        self._http = requests.Session()
+        self._http.headers.update({
             'Content-Type': 'application/json',
             'Accept': 'application/json'
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+        self._http.mount('http://', adapter)
+        self._http.mount('https://', adapter)
+        # Последний список пользователей, подтвержденный API, и его версия для дельта-обновлений
+        self._synced_users: Dict[Any, Dict] = {}
+        self._users_version: Optional[int] = None
+        self._users_lock = threading.Lock()
+        self.users_patches = 0
+        self.users_full_updates = 0
+        self.users_resyncs = 0
+        self.breaker = CircuitBreaker(failure_threshold, cooldown_s)
+        self.dispatcher = DashboardDispatcher(self._deliver, self.breaker) if background else None
+
+    def _get_backoff(self, attempt: int) -> float:
+        """
+        Пауза перед повтором: экспоненциальная с полным джиттером,
+        чтобы повторы нескольких запросов не совпадали по времени
+
+        :param attempt: Номер повтора, начиная с 0
+        :return: Пауза в секундах
+        """
+        return self._random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt))
+
+    def _post(self, endpoint: str, payload=None, method: str = 'POST') -> requests.Response:
+        """
+        Отправляет запрос к API через общий пул соединений. При ошибке подключения
+        или ответе из RETRY_STATUSES запрос повторяется не больше max_retries раз,
+        поэтому ожидание одного запроса ограничено таймаутом чтения эндпоинта.
+        Пока предохранитель разомкнут, запрос сразу завершается CircuitOpenError
+
+        :param endpoint: Путь эндпоинта, например '/users'
+        :param payload: Тело запроса, сериализуется в JSON
+        :param method: HTTP-метод
+        :return: Ответ API
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"API недоступен, повтор через {self.breaker.retry_after():.1f} с")
+        timeout = self.timeouts.get(endpoint, DEFAULT_TIMEOUT)
+        # Пробный запрос после паузы не повторяется, чтобы быстро узнать, доступен ли API
+        attempts = 1 if self.breaker.state == CircuitState.half_open else self.max_retries + 1
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                response = self._http.request(method, self.base_url + endpoint, json=payload, timeout=timeout)
+            except requests.ReadTimeout:
+                self.breaker.record_failure()
+                raise
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last:
+                    self.breaker.record_failure()
+                    raise
+                print(f"[DEBUG] {endpoint}: {e}, повтор {attempt + 1}/{attempts - 1}")
+            except requests.RequestException:
+                self.breaker.record_failure()
+                raise
+            else:
+                # Ошибки 4xx - ошибки запроса, а не недоступность API
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    response.raise_for_status()
+                    return response
+                if response.status_code not in RETRY_STATUSES or last:
+                    self.breaker.record_failure()
+                    response.raise_for_status()
+                print(f"[DEBUG] {endpoint}: ответ {response.status_code}, повтор {attempt + 1}/{attempts - 1}")
+            time.sleep(self._get_backoff(attempt))
+
+    @staticmethod
+    def _result(response: requests.Response) -> Dict:
+        return response.json() if response.content else {"status": "success"}
+
+    def _deliver(self, endpoint: str, payload=None) -> Dict:
+        """
+        Передает обновление в API. Список пользователей передается дельтой (_sync_users)
+
+        :return: Ответ API
+        """
+        if endpoint == '/users':
+            return self._sync_users(payload)
+        return self._result(self._post(endpoint, payload))
+
+    def _send(self, channel: str, endpoint: str, payload=None) -> Optional[Dict]:
+        """
+        Отправляет обновление в фоне, если включена фоновая отправка, иначе сразу
+
+        :return: Ответ API или None, если обновление поставлено в очередь
+        """
+        if self.dispatcher is not None:
+            self.dispatcher.submit(channel, endpoint, payload)
+            return None
+        return self._deliver(endpoint, payload)
+
+    def _diff_users(self, users_by_id: Dict[Any, Dict]) -> Dict[str, List]:
+        """
+        Изменения списка пользователей относительно последнего подтвержденного API.
+        Для измененных пользователей передаются только id и изменившиеся поля:
+        между раундами обычно меняется только table_index
+
+        :param users_by_id: Новый список {id: пользователь}
+        :return: {"added": [...], "changed": [...], "removed": [id, ...]}
+        """
+        synced = self._synced_users
+        added, changed = [], []
+        for user_id, user in users_by_id.items():
+            previous = synced.get(user_id)
+            if previous is None:
+                added.append(user)
+            elif previous != user:
+                fields = {key: value for key, value in user.items() if previous.get(key) != value}
+                changed.append({"id": user_id, **fields})
+        return {
+            "added": added,
+            "changed": changed,
+            "removed": [user_id for user_id in synced if user_id not in users_by_id]
         }
 
-        try:
-            response = requests.post(
-                url = self.base_url + '/users',
-                data = request_body,
-                headers=headers,
-                timeout=30
-            )
+    def _sync_users(self, users: List[Dict]) -> Dict:
+        """
+        Передает список пользователей в API дельтой (PATCH /users) относительно
+        последнего подтвержденного списка. Полный список отправляется, если версия
+        API неизвестна, у пользователей нет уникальных id, список заменяется почти
+        целиком или API отклонил дельту (версии разошлись)
+
+        :param users: Список пользователей (UserInfo.to_dict)
+        :return: Ответ API
+        """
+        with self._users_lock:
+            users_by_id = {user.get('id'): user for user in users}
+            if self._users_version is not None and None not in users_by_id and len(users_by_id) == len(users):
+                delta = self._diff_users(users_by_id)
+                changes = sum(len(items) for items in delta.values())
+                if changes == 0:
+                    return {"status": "unchanged", "version": self._users_version}
+                if len(delta['added']) + len(delta['removed']) < len(users):
+                    try:
+                        result = self._result(self._post(
+                            '/users', {"base_version": self._users_version, **delta}, method='PATCH'))
+                    except requests.HTTPError as e:
+                        # 409 - версии разошлись (например, API перезапущен), 404/405 - API без PATCH
+                        if e.response is None or e.response.status_code >= 500:
+                            raise
+                        print(f"[DEBUG] Дельта пользователей отклонена ({e.response.status_code}), "
+                              f"отправляется полный список")
+                        self.users_resyncs += 1
+                    else:
+                        self._users_version = result.get('version')
+                        self._synced_users = users_by_id
+                        self.users_patches += 1
+                        return result
 
-            response.raise_for_status()
+            try:
+                result = self._result(self._post('/users', users))
+            except Exception:
+                # Неизвестно, применил ли API список: следующее обновление будет полным
+                self._users_version = None
+                raise
+            self._users_version = result.get('version')
+            self._synced_users = users_by_id
+            self.users_full_updates += 1
+            return result
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Ждет отправки обновлений, поставленных в очередь
+
+        :param timeout: Наибольшее время ожидания в секундах
+        :return: True, если все обновления отправлены
+        """
+        return self.dispatcher.flush(timeout) if self.dispatcher is not None else True
 
-            return response.json() if response.content else {"status": "success"}
+    def get_dispatch_stats(self) -> Dict[str, Any]:
+        """
+        Статистика фоновой отправки: глубина очереди, задержка отправки и состояние предохранителя
+        """
+        stats = self.dispatcher.get_stats() if self.dispatcher is not None else {}
+        return {
+            **stats,
+            'users_version': self._users_version,
+            'users_patches': self.users_patches,
+            'users_full_updates': self.users_full_updates,
+            'users_resyncs': self.users_resyncs,
+            'circuit': self.breaker.get_stats()
+        }
+
+    def close(self, timeout: Optional[float] = None):
+        """
+        Отправляет оставшиеся обновления и закрывает соединения пула
+        """
+        if self.dispatcher is not None:
+            self.dispatcher.close(timeout)
+        self._http.close()
+    
+    def update_users(self, users: List[UserInfo]):
+        try:
+            result = self._send('users', '/users', [user.to_dict() for user in users])
+            return result if result is not None else {"status": "queued"}
         except requests.exceptions.RequestException as e:
             raise requests.RequestException(f"Ошибка при отправке данных: {str(e)}")
         except json.JSONDecodeError as e:
@@ -58,23 +539,9 @@ class AppService:
 
     def clear_users(self):
         """Отправляет пустой массив пользователей для очистки дашборда"""
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-
-        request_body = json.dumps([])
-
         try:
-            response = requests.post(
-                url = self.base_url + '/users',
-                data = request_body,
-                headers=headers,
-                timeout=30
-            )
-
-            response.raise_for_status()
-            return response.json() if response.content else {"status": "success"}
+            result = self._send('users', '/users', [])
+            return result if result is not None else {"status": "queued"}
         except requests.exceptions.RequestException as e:
             print(f"[DEBUG] Не удалось очистить пользователей: {e}")
         except json.JSONDecodeError as e:
@@ -91,13 +558,7 @@ class AppService:
         }
         
         try:
-            response = requests.post(
-                url = self.base_url + "/metrics", 
-                json=empty_metrics
-            )
-            response.raise_for_status()
-            # Очищаем множество встретившихся пар
-            self._met_pairs.clear()
+            self._send('metrics', '/metrics', empty_metrics)
         except Exception as e:
             print(f"[DEBUG] Не удалось очистить метрики: {e}")
 
@@ -106,80 +567,109 @@ class AppService:
         self.clear_users()
         self.clear_metrics()
 
-    def send_metrics(self, stats, round_time, break_time, round_num):
-        # Получаем текущие столы из stats
-        current_tables = {}
-        if 'current_round_tables' in stats:
-            # Группируем участников по столам
-            for user_id, table_idx in stats['current_round_tables'].items():
-                if table_idx not in current_tables:
-                    current_tables[table_idx] = []
-                current_tables[table_idx].append(int(user_id))
-            
-            # Обновляем множество встретившихся пар
-            self._update_met_pairs(current_tables)
-        
-        # Вычисляем все возможные пары
-        all_pairs = self._get_all_possible_pairs(stats['total_participants'])
-        
-        # Вычисляем количество незнакомых пар
-        strangers_num = len(all_pairs) - len(self._met_pairs)
-        
-        # Вычисляем необходимое количество раундов
-        total_rounds = self.calculate_total_rounds(
-            total_participants=stats['total_participants'],
-            seats_per_table=stats['seats_per_table']
-        )
-        
+    def send_metrics(self, snapshot: Dict, round_time, break_time, round_num: Optional[int] = None):
+        """
+        Отправляет метрики сессии на дашборд
+
+        :param snapshot: Снимок метрик планировщика (SessionScheduler.get_metrics_snapshot)
+        :param round_time: Длительность раунда в минутах
+        :param break_time: Длительность перерыва в минутах
+        :param round_num: Номер текущего раунда, по умолчанию - из снимка
+        :return: Отправленные метрики
+        """
         metrics_json = {
-            "current_round": round_num,
-            "total_rounds": total_rounds,
+            "current_round": snapshot['current_round'] if round_num is None else round_num,
+            # Нижняя граница числа раундов уже посчитана планировщиком для текущего состава
+            "total_rounds": max(1, snapshot['rounds_lower_bound']),
             "round_time_minutes": round_time,
             "break_time_minutes": break_time,
-            "strangers_num": strangers_num
+            "strangers_num": snapshot['strangers_num'],
+            "repeated_pairs": snapshot['repeated_pairs']
         }
 
         try:
-            requests.post(
-                url = self.base_url + "/metrics", 
-                json=metrics_json
-            )
+            self._send('metrics', '/metrics', metrics_json)
 
         except Exception as e:
             print(f"[DEBUG] Не удалось отправить метрики: {e}: {metrics_json}")
-            print(f"[DEBUG] Текущие столы: {current_tables}")
-            print(f"[DEBUG] Всего пар: {len(all_pairs)}, встретившихся пар: {len(self._met_pairs)}")
         
         return metrics_json
 
-    def calculate_total_rounds(self, total_participants: int, seats_per_table: int) -> int:
-        """
-        Вычисляет необходимое количество раундов
-        
-        Args:
-            total_participants (int): Общее количество участников
-            seats_per_table (int): Количество мест за одним столом
-            
-        Returns:
-            int: Необходимое количество раундов
-        """
-        if total_participants <= 1 or seats_per_table <= 1:
-            return 1
-            
-        # За один раунд участник встречается с (seats_per_table-1) новыми людьми
-        # Всего нужно встретиться с (total_participants-1) людьми
-        return math.ceil((total_participants - 1) / (seats_per_table - 1))
-
     def start_session(self):
-        # При старте сессии очищаем множество встретившихся пар
-        self._met_pairs.clear()
-        requests.post(
-            url = self.base_url + "/start"
-        )
+        self._send('session', '/start')
 
     def stop_session(self):
-        # При остановке сессии очищаем множество встретившихся пар
-        self._met_pairs.clear()
-        requests.post(
-            url = self.base_url + "/stop"
-        )
\ No newline at end of file
+        self._send('session', '/stop')
+
+
+def check_dispatcher() -> int:
+    """
+    Проверяет фоновую отправку и предохранитель на локальном HTTP-сервере:
+    отклоненное API обновление (400) отправляется один раз и не повторяется,
+    обновление при недоступном API (503) повторяется с паузами, а после
+    восстановления API доставляется
+
+    :return: Количество найденных нарушений
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = {'status': 400, 'requests': 0, 'body': None}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            state['requests'] += 1
+            if state['status'] == 200:
+                state['body'] = json.loads(body)
+            self.send_response(state['status'])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stats = {'total_participants': 4, 'seats_per_table': 2, 'tables': 2, 'current_round': 1,
+             'rounds_lower_bound': 3, 'strangers_num': 4, 'repeated_pairs': 0}
+    errors = []
+
+    service = AppService(f"http://127.0.0.1:{server.server_port}/api", cooldown_s=0.5)
+    service.send_metrics(stats, 3, 1)
+    service.flush(5)
+    time.sleep(1)
+    dispatch = service.get_dispatch_stats()
+    if state['requests'] != 1:
+        errors.append(f"ответ 400: {state['requests']} запросов вместо 1")
+    if dispatch['dropped'] != 1 or dispatch['deferred'] != 0:
+        errors.append(f"ответ 400: отброшено {dispatch['dropped']}, отложено {dispatch['deferred']}")
+    if dispatch['circuit']['state'] != CircuitState.closed.value:
+        errors.append(f"ответ 400: предохранитель {dispatch['circuit']['state']}")
+
+    state.update(status=503, requests=0)
+    service.send_metrics(stats, 3, 1, round_num=2)
+    time.sleep(2)
+    # Без пауз между повторами запросов были бы сотни
+    if state['requests'] > 3 * (service.max_retries + 1) + 2:
+        errors.append(f"ответ 503: {state['requests']} запросов за 2 с")
+    dispatch = service.get_dispatch_stats()
+    if dispatch['sent'] != 0 or dispatch['dropped'] != 1:
+        errors.append(f"ответ 503: отправлено {dispatch['sent']}, отброшено {dispatch['dropped']}")
+
+    state['status'] = 200
+    deadline = time.monotonic() + 5
+    while state['body'] is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if state['body'] is None or state['body']['current_round'] != 2:
+        errors.append(f"после восстановления API метрики не доставлены: {state['body']}")
+
+    service.close(1)
+    server.shutdown()
+    print(f"\n=== Проверка фоновой отправки: нарушений: {len(errors)} ===")
+    for error in errors:
+        print(f"Ошибка: {error}")
+    return len(errors)
+
+
+if __name__ == '__main__':
+    check_dispatcher()
\ No newline at end of file
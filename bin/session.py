@@ -1,272 +1,1877 @@
 import random
 import itertools
-from typing import List, Dict, Set, FrozenSet, Optional
+import functools
+from enum import Enum
+from typing import List, Dict, Set, FrozenSet, Optional, Iterator, Tuple, Callable
 import math
+import re
+import time
+import copy
+import hashlib
+import heapq
+import collections
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+import numpy as np
+
+from bin.cache import ScheduleCache
 
 
 random_seed_num = 42
 
-def split_into_tables(participants: List[int], num_tables: int, seats_per_table: int) -> List[List[int]]:
+# Версия алгоритмов рассадки; увеличивается, когда меняются рассчитываемые расписания
+ENGINE_VERSION = 1
+
+# Веса оценки рассадки
+NEW_PAIR_WEIGHT = 100
+PRIORITY_PAIR_WEIGHT = 50
+SIZE_DIFF_PENALTY = 10
+
+_NONZERO_CELL = re.compile(b'[^\x00]')
+
+# Приблизительная стоимость в байтах записи о паре (frozenset или кортеж в словаре)
+# и записи об участнике в индексах, для оценки памяти сессии
+PAIR_ENTRY_BYTES = 200
+PARTICIPANT_ENTRY_BYTES = 150
+
+# Количество попыток поиска рассадки на раунд по умолчанию
+DEFAULT_ATTEMPTS = 1000
+
+# Размер пачки кандидатов, оцениваемых одной операцией с массивами
+BATCH_SIZE = 256
+
+# Число обменов локального поиска на одну попытку, если бюджет не задан явно
+LOCAL_SEARCH_ITERATIONS_PER_ATTEMPT = 20
+# Доля ходов локального поиска, пересаживающих участника без обмена
+LOCAL_SEARCH_MOVE_PROBABILITY = 0.2
+
+
+def get_max_pairs_per_round(participants_count: int, num_tables: int, seats_per_table: int) -> int:
+    """
+    Максимальное число пар, которые могут сидеть вместе за один раунд:
+    столы заполняются до seats_per_table, стол из одного человека невозможен
+
+    :param participants_count: Количество участников
+    :param num_tables: Максимальное количество столов
+    :param seats_per_table: Количество мест за столом
+    :return: Максимальное число пар за раунд
+    """
+    seats = max(seats_per_table, 2)
+    tables_count = min(num_tables, participants_count // 2)
+    if tables_count <= 0:
+        return 0
+    seated = min(participants_count, tables_count * seats)
+    full_tables, remainder = divmod(seated, seats)
+    pairs = full_tables * seats * (seats - 1) // 2 + remainder * (remainder - 1) // 2
+    if remainder == 1:
+        # Последнего участника нельзя посадить одного: стол seats и стол из 1 -> столы seats-1 и 2
+        pairs += (seats - 1) * (seats - 2) // 2 + 1 - seats * (seats - 1) // 2
+    return pairs
+
+
+def get_table_sizes(participants_count: int, num_tables: int, seats_per_table: int) -> List[int]:
+    """
+    Размеры столов равномерной рассадки, которую строит split_into_tables:
+    не больше num_tables столов, минимум 2 человека за столом,
+    не больше seats_per_table мест. Не поместившиеся участники не рассаживаются
+
+    :param participants_count: Количество участников
+    :param num_tables: Максимальное количество столов
+    :param seats_per_table: Количество мест за столом
+    :return: Список размеров столов по убыванию
+    """
+    tables_count = min(num_tables, participants_count // 2)
+    if tables_count <= 0:
+        return []
+    seated = min(participants_count, tables_count * max(seats_per_table, 2))
+    base, extra = divmod(seated, tables_count)
+    return [base + 1] * extra + [base] * (tables_count - extra)
+
+def split_into_tables(
+        participants: List[int],
+        num_tables: int,
+        seats_per_table: int,
+        rng: random.Random = None) -> List[List[int]]:
     """
     Распределяет участников по столам с учетом ограничений:
     - За каждым столом должно быть минимум 2 человека
     - За столом не должно быть больше seats_per_table человек
     - Распределение должно быть максимально равномерным
     
+    Размеры столов вычисляются заранее (get_table_sizes), после чего рассаживаемые
+    участники перемешиваются и нарезаются по столам за O(n).
+    Если мест меньше, чем участников, рассаживаются первые по порядку участники,
+    поэтому вызывающий код может передавать их по убыванию приоритета
+    
     :param participants: Список участников
     :param num_tables: Максимальное количество столов
     :param seats_per_table: Количество мест за столом
+    :param rng: Генератор случайных чисел, по умолчанию глобальный модуль random
     :return: Список столов с участниками
     """
-    if not participants or len(participants) < 2:
+    rng = rng or random
+    sizes = get_table_sizes(len(participants), num_tables, seats_per_table)
+    if not sizes:
         return []
+
+    seated = list(participants[:sum(sizes)])
+    rng.shuffle(seated)
+
+    tables = []
+    offset = 0
+    for size in sizes:
+        tables.append(seated[offset:offset + size])
+        offset += size
+    return tables
+
+class StopReason(Enum):
+    attempts = "ATTEMPTS"
+    deadline = "DEADLINE"
+    upper_bound = "UPPER_BOUND"
+    plateau = "PLATEAU"
+
+
+class SearchBudget:
+    """
+    Условия остановки поиска рассадки: число попыток, срок, достижение
+    верхней границы новых пар и отсутствие улучшений в течение окна попыток
+
+    :param attempts: Количество попыток или None - без ограничения
+    :param deadline_ms: Ограничение времени в миллисекундах
+    :param plateau_window: Остановка, если столько попыток подряд нет улучшения
+    :param target_new_pairs: Остановка, когда лучшая рассадка дает столько новых пар
+    """
+    def __init__(
+            self,
+            attempts: Optional[int] = None,
+            deadline_ms: Optional[float] = None,
+            plateau_window: Optional[int] = None,
+            target_new_pairs: Optional[int] = None):
+        self.attempts = attempts
+        self.started = time.perf_counter()
+        self.deadline = self.started + deadline_ms / 1000 if deadline_ms is not None else None
+        self.plateau_window = plateau_window
+        self.target_new_pairs = target_new_pairs
+        self.attempts_used = 0
+        self.best_new_pairs: Optional[int] = None
+        self.stop_reason: Optional[StopReason] = None
+        self._since_improvement = 0
+
+    def record(self, count: int = 1, best_new_pairs: Optional[int] = None, improved: bool = False):
+        """
+        Учитывает выполненные попытки и лучший найденный результат
+        """
+        self.attempts_used += count
+        self._since_improvement = 0 if improved else self._since_improvement + count
+        if best_new_pairs is not None:
+            self.best_new_pairs = best_new_pairs
+
+    def exhausted(self) -> bool:
+        """
+        Проверяет условия остановки и запоминает причину
+        """
+        if self.stop_reason is not None:
+            return True
+        if (self.target_new_pairs is not None and self.best_new_pairs is not None
+                and self.best_new_pairs >= self.target_new_pairs):
+            self.stop_reason = StopReason.upper_bound
+        elif self.attempts is not None and self.attempts_used >= self.attempts:
+            self.stop_reason = StopReason.attempts
+        elif self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stop_reason = StopReason.deadline
+        elif self.plateau_window is not None and self._since_improvement >= self.plateau_window:
+            self.stop_reason = StopReason.plateau
+        return self.stop_reason is not None
+
+    def remaining_attempts(self) -> Optional[int]:
+        if self.attempts is None:
+            return None
+        return max(self.attempts - self.attempts_used, 0)
+
+    def remaining_ms(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max((self.deadline - time.perf_counter()) * 1000, 0.0)
+
+    def progress(self) -> float:
+        """
+        Доля израсходованного бюджета от 0 до 1: по времени, если задан срок, иначе по попыткам
+        """
+        if self.deadline is not None:
+            total = self.deadline - self.started
+            return min((time.perf_counter() - self.started) / total, 1.0) if total > 0 else 1.0
+        if self.attempts:
+            return min(self.attempts_used / self.attempts, 1.0)
+        return 0.0
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+
+class PairBackend(Enum):
+    set = "SET"
+    matrix = "MATRIX"
+
+
+class SearchEngine(Enum):
+    random = "RANDOM"
+    batch = "BATCH"
+    local_search = "LOCAL_SEARCH"
+    greedy = "GREEDY"
+
+
+class ParticipantIndex:
+    """
+    Отображение id участников (Telegram int64 и отрицательные id моков)
+    в плотные индексы 0..N-1. Индекс участника не меняется после удаления,
+    поэтому его история встреч сохраняется при повторном входе
+    """
+    def __init__(self, participants: List[int] = None):
+        self._index: Dict[int, int] = {}
+        self.ids: List[int] = []
+        for participant in participants or []:
+            self.add(participant)
+
+    def add(self, participant: int) -> int:
+        """
+        Зарегистрировать участника
+
+        :param participant: id участника
+        :return: Плотный индекс участника
+        """
+        idx = self._index.get(participant)
+        if idx is None:
+            idx = len(self.ids)
+            self._index[participant] = idx
+            self.ids.append(participant)
+        return idx
+
+    def get(self, participant: int) -> Optional[int]:
+        return self._index.get(participant)
+
+    def __contains__(self, participant: int) -> bool:
+        return participant in self._index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class RoundHistory:
+    """
+    Компактная история раундов: на каждый раунд один массив номеров столов
+    по плотным индексам участников (ParticipantIndex). Номер стола хранится
+    в uint8, а при 255 и более столах - в uint16, поэтому раунд занимает
+    около одного байта на участника. Массив раунда покрывает участников,
+    зарегистрированных к этому раунду: пришедшие позже считаются не сидевшими.
+
+    Для совместимости история ведет себя как список словарей {участник: номер_стола}
+    """
+    def __init__(self, index: ParticipantIndex):
+        self._index = index
+        self._rounds: List[np.ndarray] = []
+
+    @staticmethod
+    def _dtype(tables_count: int):
+        return np.uint8 if tables_count < np.iinfo(np.uint8).max else np.uint16
+
+    def append(self, round_dict: Dict[int, int]):
+        """
+        Добавить раунд
+
+        :param round_dict: Словарь {участник: номер_стола}
+        """
+        dense = np.fromiter((self._index.add(participant) for participant in round_dict), dtype=np.int64, count=len(round_dict))
+        table_ids = np.fromiter(round_dict.values(), dtype=np.int64, count=len(round_dict))
+        dtype = self._dtype(int(table_ids.max()) + 1 if table_ids.size else 0)
+        tables = np.full(len(self._index), np.iinfo(dtype).max, dtype=dtype)
+        tables[dense] = table_ids
+        tables.flags.writeable = False
+        self._rounds.append(tables)
+
+    def as_array(self, round_idx: int) -> np.ndarray:
+        """
+        Номера столов раунда по плотным индексам участников без копирования.
+        Значение np.iinfo(массив.dtype).max означает, что участник не сидел за столом.
+        Массив доступен только для чтения
+
+        :param round_idx: Номер раунда с нуля
+        """
+        return self._rounds[round_idx]
+
+    @property
+    def ids(self) -> List[int]:
+        """
+        id участников по плотным индексам: ids[i] соответствует элементу i массивов раундов
+        """
+        return self._index.ids
+
+    def table_of(self, participant: int, round_idx: int) -> Optional[int]:
+        """
+        Номер стола участника в раунде за O(1)
+
+        :return: Номер стола или None, если участник не сидел за столом
+        """
+        tables = self._rounds[round_idx]
+        idx = self._index.get(participant)
+        if idx is None or idx >= len(tables) or tables[idx] == np.iinfo(tables.dtype).max:
+            return None
+        return int(tables[idx])
+
+    def tablemates(self, participant: int, round_idx: int) -> List[int]:
+        """
+        С кем участник сидел за одним столом в раунде: один векторный проход по массиву раунда
+
+        :param participant: Участник
+        :param round_idx: Номер раунда с нуля
+        :return: Список соседей по столу
+        """
+        table_idx = self.table_of(participant, round_idx)
+        if table_idx is None:
+            return []
+        ids = self._index.ids
+        return [ids[i] for i in np.flatnonzero(self._rounds[round_idx] == table_idx) if ids[i] != participant]
+
+    def tables(self, round_idx: int) -> List[List[int]]:
+        """
+        Столы раунда
+
+        :param round_idx: Номер раунда с нуля
+        :return: Список столов с участниками по номерам столов
+        """
+        tables = self._rounds[round_idx]
+        seated = np.flatnonzero(tables != np.iinfo(tables.dtype).max)
+        if seated.size == 0:
+            return []
+        order = seated[np.argsort(tables[seated], kind='stable')]
+        bounds = np.flatnonzero(np.diff(tables[order].astype(np.int64))) + 1
+        ids = self._index.ids
+        return [[ids[i] for i in group] for group in np.split(order, bounds)]
+
+    def nbytes(self) -> int:
+        """
+        Объем памяти массивов истории в байтах
+        """
+        return sum(tables.nbytes for tables in self._rounds)
+
+    def __getitem__(self, round_idx: int) -> Dict[int, int]:
+        tables = self._rounds[round_idx]
+        ids = self._index.ids
+        seated = np.flatnonzero(tables != np.iinfo(tables.dtype).max)
+        return {ids[i]: int(tables[i]) for i in seated}
+
+    def __len__(self) -> int:
+        return len(self._rounds)
+
+    def __iter__(self) -> Iterator[Dict[int, int]]:
+        for round_idx in range(len(self._rounds)):
+            yield self[round_idx]
+
+
+class PairSetStore:
+    """
+    Хранилище встретившихся пар на основе множества frozenset
+    """
+    def __init__(self):
+        self._pairs: Set[FrozenSet[int]] = set()
+
+    def add_participant(self, participant: int):
+        pass
+
+    def add_pair(self, first: int, second: int) -> bool:
+        """
+        Отметить пару как встретившуюся
+
+        :return: True, если пара встретилась впервые
+        """
+        pair = frozenset((first, second))
+        if pair in self._pairs:
+            return False
+        self._pairs.add(pair)
+        return True
+
+    def has_met(self, first: int, second: int) -> bool:
+        return frozenset((first, second)) in self._pairs
+
+    def add(self, pair: FrozenSet[int]):
+        first, second = pair
+        self.add_pair(first, second)
+
+    def __contains__(self, pair: FrozenSet[int]) -> bool:
+        return pair in self._pairs
+
+    def __len__(self) -> int:
+        return len(self._pairs)
+
+    def nbytes(self) -> int:
+        """
+        Приблизительный объем памяти множества в байтах
+        """
+        return len(self._pairs) * PAIR_ENTRY_BYTES
+
+    def __iter__(self) -> Iterator[FrozenSet[int]]:
+        return iter(self._pairs)
+
+
+class MatrixPairStore:
+    """
+    Хранилище встретившихся пар в виде упакованной треугольной матрицы uint8.
+    Пара плотных индексов (i, j), i < j, хранится в ячейке j*(j-1)/2 + i,
+    поэтому при добавлении участника матрица только дописывается в конец
+    """
+    def __init__(self, index: ParticipantIndex):
+        self._index = index
+        self._cells = bytearray(len(index) * (len(index) - 1) // 2)
+        self._count = 0
+
+    def add_participant(self, participant: int):
+        self._index.add(participant)
+        size = len(self._index)
+        missing = size * (size - 1) // 2 - len(self._cells)
+        if missing > 0:
+            self._cells.extend(bytes(missing))
+
+    def _offset(self, first: int, second: int) -> Optional[int]:
+        i = self._index.get(first)
+        j = self._index.get(second)
+        if i is None or j is None or i == j:
+            return None
+        if i > j:
+            i, j = j, i
+        return j * (j - 1) // 2 + i
+
+    def add_pair(self, first: int, second: int) -> bool:
+        """
+        Отметить пару как встретившуюся
+
+        :return: True, если пара встретилась впервые
+        """
+        self.add_participant(first)
+        self.add_participant(second)
+        offset = self._offset(first, second)
+        if offset is None or self._cells[offset]:
+            return False
+        self._cells[offset] = 1
+        self._count += 1
+        return True
+
+    def has_met(self, first: int, second: int) -> bool:
+        offset = self._offset(first, second)
+        return offset is not None and self._cells[offset] != 0
+
+    def add(self, pair: FrozenSet[int]):
+        first, second = pair
+        self.add_pair(first, second)
+
+    def __contains__(self, pair: FrozenSet[int]) -> bool:
+        first, second = pair
+        return self.has_met(first, second)
+
+    def as_array(self) -> np.ndarray:
+        """
+        Представление матрицы в виде массива NumPy без копирования.
+        Массив нельзя хранить дольше одного вызова: пока он существует,
+        матрица не может расти при добавлении участников
+        """
+        return np.frombuffer(self._cells, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def nbytes(self) -> int:
+        """
+        Объем памяти матрицы в байтах
+        """
+        return len(self._cells)
+
+    def __iter__(self) -> Iterator[FrozenSet[int]]:
+        ids = self._index.ids
+        # Поиск ненулевых ячеек выполняется в C, без обхода всей матрицы в Python
+        for match in _NONZERO_CELL.finditer(self._cells):
+            offset = match.start()
+            j = (1 + math.isqrt(8 * offset + 1)) // 2
+            i = offset - j * (j - 1) // 2
+            yield frozenset((ids[i], ids[j]))
+
+
+def _table_pairs(table: List[int]) -> Iterator[Tuple[int, int]]:
+    """
+    Перебирает все пары участников за одним столом
+    """
+    for i in range(len(table)):
+        for j in range(i + 1, len(table)):
+            yield table[i], table[j]
+
+
+def _round_to_tables(round_dict: Dict[int, int]) -> List[List[int]]:
+    """
+    Преобразует раунд {участник: номер_стола} в список столов
+    """
+    tables: Dict[int, List[int]] = {}
+    for participant, table_idx in round_dict.items():
+        tables.setdefault(table_idx, []).append(participant)
+    return [tables[table_idx] for table_idx in sorted(tables)]
+
+
+def _tables_to_positions(tables: List[List[int]], roster: List[int]) -> List[int]:
+    """
+    Переводит столы раунда в номера столов по позициям участников в roster (-1 - без места)
+    """
+    positions = {participant: position for position, participant in enumerate(roster)}
+    result = [-1] * len(roster)
+    for table_idx, table in enumerate(tables):
+        for participant in table:
+            result[positions[participant]] = table_idx
+    return result
+
+
+def _positions_to_tables(positions: List[int], roster: List[int]) -> List[List[int]]:
+    """
+    Переводит номера столов по позициям участников обратно в столы с id из roster
+    """
+    tables: Dict[int, List[int]] = {}
+    for participant, table_idx in zip(roster, positions):
+        if table_idx >= 0:
+            tables.setdefault(table_idx, []).append(participant)
+    return [tables[table_idx] for table_idx in sorted(tables)]
+
+
+def _parallel_search_worker(scheduler: 'SessionScheduler', budget: 'SearchBudget', seed: str):
+    """
+    Поиск рассадки в рабочем процессе на копии планировщика
+    со своим потоком случайных чисел
+
+    :return: (рассадка, оценка, использовано попыток, причина остановки)
+    """
+    scheduler._rng = random.Random(seed)
+    tables, score = scheduler._search(budget)
+    return tables, score, budget.attempts_used, budget.stop_reason
+
+
+def _profile_pair_positions(profile: np.ndarray, offset: int):
+    """
+    Позиции пар участников за одним столом в рассадке, упорядоченной по столам
+
+    :param profile: Размеры столов по порядку номеров
+    :param offset: Количество неусаженных участников в начале порядка
+    :return: (позиции первых участников пар, позиции вторых участников пар)
+    """
+    first_positions = []
+    second_positions = []
+    start = offset
+    for size in profile.tolist():
+        for i in range(start, start + size):
+            for j in range(i + 1, start + size):
+                first_positions.append(i)
+                second_positions.append(j)
+        start += size
+    return np.array(first_positions, dtype=np.int64), np.array(second_positions, dtype=np.int64)
+
+
+# Максимальное число участников, для которого строятся аффинные геометрии
+MAX_DESIGN_PARTICIPANTS = 1024
+
+# Неприводимые многочлены для полей Галуа непростого порядка:
+# порядок -> (характеристика, коэффициенты от младшего к старшему)
+_IRREDUCIBLE_POLYNOMIALS = {
+    4: (2, [1, 1, 1]),         # x^2 + x + 1
+    8: (2, [1, 1, 0, 1]),      # x^3 + x + 1
+    9: (3, [1, 0, 1]),         # x^2 + 1
+    16: (2, [1, 1, 0, 0, 1]),  # x^4 + x + 1
+    25: (5, [2, 1, 1]),        # x^2 + x + 2
+    27: (3, [1, 2, 0, 1]),     # x^3 + 2x + 1
+}
+
+# Система троек Киркмана на 15 участников (задача о школьницах): 7 раундов по 5 троек
+_KIRKMAN_15 = [
+    [[0, 1, 2], [3, 7, 11], [4, 9, 14], [5, 10, 12], [6, 8, 13]],
+    [[0, 3, 4], [1, 7, 9], [2, 12, 13], [5, 8, 14], [6, 10, 11]],
+    [[0, 5, 6], [1, 8, 10], [2, 11, 14], [3, 9, 13], [4, 7, 12]],
+    [[0, 7, 8], [1, 11, 13], [2, 4, 5], [3, 10, 14], [6, 9, 12]],
+    [[0, 9, 10], [1, 12, 14], [2, 3, 6], [4, 8, 11], [5, 7, 13]],
+    [[0, 11, 12], [1, 3, 5], [2, 8, 9], [4, 10, 13], [6, 7, 14]],
+    [[0, 13, 14], [1, 4, 6], [2, 7, 10], [3, 8, 12], [5, 9, 11]],
+]
+
+
+def _is_prime(number: int) -> bool:
+    if number < 2:
+        return False
+    return all(number % divisor for divisor in range(2, math.isqrt(number) + 1))
+
+
+def _galois_field(order: int) -> Optional[Tuple[List[List[int]], List[List[int]]]]:
+    """
+    Таблицы сложения и умножения поля Галуа заданного порядка.
+    Элемент поля кодируется числом, цифры которого в системе счисления
+    по основанию характеристики - коэффициенты многочлена
+
+    :param order: Порядок поля
+    :return: (таблица сложения, таблица умножения) или None, если поле не поддерживается
+    """
+    if _is_prime(order):
+        add = [[(a + b) % order for b in range(order)] for a in range(order)]
+        mul = [[(a * b) % order for b in range(order)] for a in range(order)]
+        return add, mul
+    if order not in _IRREDUCIBLE_POLYNOMIALS:
+        return None
+
+    prime, modulus = _IRREDUCIBLE_POLYNOMIALS[order]
+    degree = len(modulus) - 1
+
+    def to_poly(element: int) -> List[int]:
+        return [(element // prime ** i) % prime for i in range(degree)]
+
+    def from_poly(coefficients: List[int]) -> int:
+        return sum(c * prime ** i for i, c in enumerate(coefficients))
+
+    def multiply(a: int, b: int) -> int:
+        product = [0] * (2 * degree - 1)
+        for i, x in enumerate(to_poly(a)):
+            for j, y in enumerate(to_poly(b)):
+                product[i + j] = (product[i + j] + x * y) % prime
+        # Приводим по модулю нормированного неприводимого многочлена
+        for power in range(len(product) - 1, degree - 1, -1):
+            factor = product[power]
+            if factor:
+                for i, c in enumerate(modulus):
+                    product[power - degree + i] = (product[power - degree + i] - factor * c) % prime
+        return from_poly(product[:degree])
+
+    add = [[from_poly([(x + y) % prime for x, y in zip(to_poly(a), to_poly(b))]) for b in range(order)] for a in range(order)]
+    mul = [[multiply(a, b) for b in range(order)] for a in range(order)]
+    return add, mul
+
+
+def _affine_geometry_design(order: int, dimension: int) -> List[List[List[int]]]:
+    """
+    Резольвабельный дизайн из прямых аффинной геометрии AG(dimension, order):
+    order^dimension участников, столы по order мест. Каждый класс параллельных
+    прямых - один раунд, всего (order^dimension - 1) / (order - 1) раундов
+
+    :param order: Порядок поля (простое число или степень простого)
+    :param dimension: Размерность пространства
+    :return: Список раундов, раунд - список столов с номерами участников
+    """
+    add, mul = _galois_field(order)
+    points = list(itertools.product(range(order), repeat=dimension))
+    point_index = {point: idx for idx, point in enumerate(points)}
+
+    # Направления - векторы, у которых первая ненулевая координата равна 1
+    directions = [point for point in points if any(point) and point[next(i for i, c in enumerate(point) if c)] == 1]
+
+    rounds = []
+    for direction in directions:
+        covered = set()
+        blocks = []
+        for point in points:
+            if point in covered:
+                continue
+            line = [
+                tuple(add[coordinate][mul[step][shift]] for coordinate, shift in zip(point, direction))
+                for step in range(order)
+            ]
+            covered.update(line)
+            blocks.append([point_index[p] for p in line])
+        rounds.append(blocks)
+    return rounds
+
+
+def _round_robin_design(participants_count: int) -> List[List[List[int]]]:
+    """
+    Круговая система для столов по 2 места (метод многоугольника):
+    четное число участников, participants_count - 1 раундов
+
+    :param participants_count: Четное количество участников
+    :return: Список раундов, раунд - список столов с номерами участников
+    """
+    others = list(range(1, participants_count))
+    rounds = []
+    for _ in range(participants_count - 1):
+        circle = [0] + others
+        rounds.append([[circle[i], circle[participants_count - 1 - i]] for i in range(participants_count // 2)])
+        others = others[-1:] + others[:-1]
+    return rounds
+
+
+def _build_design_catalog() -> Dict[Tuple[int, int], Callable[[], List[List[List[int]]]]]:
+    """
+    Каталог резольвабельных дизайнов: (участники, места за столом) -> генератор
+    """
+    catalog = {(15, 3): lambda: [[list(block) for block in blocks] for blocks in _KIRKMAN_15]}
+    for order in range(3, math.isqrt(MAX_DESIGN_PARTICIPANTS) + 1):
+        if not (_is_prime(order) or order in _IRREDUCIBLE_POLYNOMIALS):
+            continue
+        dimension = 2
+        while order ** dimension <= MAX_DESIGN_PARTICIPANTS:
+            catalog[(order ** dimension, order)] = functools.partial(_affine_geometry_design, order, dimension)
+            dimension += 1
+    return catalog
+
+
+DESIGN_CATALOG = _build_design_catalog()
+
+
+def get_resolvable_design_shape(participants_count: int, seats_per_table: int) -> Optional[Tuple[int, int]]:
+    """
+    Число раундов и столов расписания get_resolvable_design без его построения, за O(1)
+
+    :param participants_count: Количество участников
+    :param seats_per_table: Количество мест за столом
+    :return: (раунды, столы) или None, если расписание неизвестно
+    """
+    if participants_count < 2 or seats_per_table < 2:
+        return None
+    if participants_count <= seats_per_table:
+        return 1, 1
+    if ((seats_per_table == 2 and participants_count % 2 == 0)
+            or (participants_count, seats_per_table) in DESIGN_CATALOG):
+        return (participants_count - 1) // (seats_per_table - 1), participants_count // seats_per_table
+    return None
+
+
+@functools.lru_cache(maxsize=64)
+def get_resolvable_design(participants_count: int, seats_per_table: int) -> Optional[List[List[List[int]]]]:
+    """
+    Расписание без повторных встреч за минимальное число раундов
+    ceil((participants_count - 1) / (seats_per_table - 1)), если оно известно:
+    один стол, круговая система для пар, аффинные геометрии и система Киркмана
+
+    :param participants_count: Количество участников
+    :param seats_per_table: Количество мест за столом
+    :return: Список раундов со столами из номеров участников 0..participants_count-1 или None
+    """
+    if get_resolvable_design_shape(participants_count, seats_per_table) is None:
+        return None
+    if participants_count <= seats_per_table:
+        return [[list(range(participants_count))]]
+    if seats_per_table == 2:
+        return _round_robin_design(participants_count)
+    return DESIGN_CATALOG[(participants_count, seats_per_table)]()
+
+
+class SessionScheduler:
+    def __init__(
+            self,
+            participants: List[int],
+            n: int,
+            m: int,
+            pair_backend: str = PairBackend.set.value,
+            engine: str = SearchEngine.random.value,
+            seed: int = random_seed_num,
+            workers: int = 1,
+            search_iterations: Optional[int] = None,
+            search_time_ms: Optional[int] = None,
+            greedy_start: bool = False,
+            use_designs: bool = True,
+            schedule_cache: Optional[ScheduleCache] = None,
+            executor: Optional[Executor] = None,
+            max_participants: Optional[int] = None):
+        """
+        Инициализация планировщика сессии
         
-    total_participants = len(participants)
+        :param participants: Список участников
+        :param n: Количество столов
+        :param m: Количество мест за столом
+        :param pair_backend: Хранилище встретившихся пар (PairBackend): множество frozenset или плотная матрица
+        :param engine: Алгоритм поиска рассадки (SearchEngine)
+        :param seed: Зерно генератора случайных чисел планировщика
+        :param workers: Количество процессов для параллельного поиска рассадки
+        :param search_iterations: Бюджет ходов локального поиска на раунд,
+            по умолчанию attempts * LOCAL_SEARCH_ITERATIONS_PER_ATTEMPT
+        :param search_time_ms: Ограничение времени локального поиска на раунд в миллисекундах
+        :param greedy_start: Начинать случайный и локальный поиск с жадной рассадки
+        :param use_designs: Использовать готовое расписание из каталога дизайнов, если оно существует
+        :param schedule_cache: Дисковый кэш планов сессии, рассчитанных с начала сессии
+        :param executor: Общий пул процессов для параллельного поиска. Планировщик не останавливает чужой пул
+        :param max_participants: Ограничение числа участников, а с ним и памяти сессии
+        """
+        if max_participants is not None and len(dict.fromkeys(participants)) > max_participants:
+            raise ValueError(f"Участников больше допустимого для сессии: {max_participants}")
+        # Повторные вхождения участника не учитываются
+        self.participants = list(dict.fromkeys(participants))
+        self.n = n
+        self.m = m
+        self.p = n * m
+        self.pair_backend = PairBackend(pair_backend)
+        self.engine = SearchEngine(engine)
+        if self.engine == SearchEngine.batch and self.pair_backend != PairBackend.matrix:
+            raise ValueError("Пакетный поиск рассадки работает только с матричным хранилищем пар")
+        self._index = ParticipantIndex(self.participants)
+        if self.pair_backend == PairBackend.matrix:
+            self.met_pairs = MatrixPairStore(self._index)
+        else:
+            self.met_pairs = PairSetStore()
+        # Число различных текущих участников, с которыми встретился каждый участник
+        self._meetings: Dict[int, int] = {participant: 0 for participant in self.participants}
+        # Число встреченных пар среди текущих участников и число участников хотя бы с одной встречей.
+        # Обновляются при фиксации раунда, входе и выходе участников, поэтому покрытие считается за O(1)
+        self._met_pairs_active = 0
+        self._met_users = 0
+        # Индекс повторов: пара (меньший id, больший id) -> число встреч для пар, встретившихся больше одного раза.
+        # Первая встреча хранится в met_pairs, поэтому индекс содержит только повторы и обновляется при фиксации раунда
+        self._repeated_pairs: Dict[Tuple[int, int], int] = {}
+        self._total_repeated_meetings = 0
+        # История раундов: массив номеров столов на раунд по плотным индексам участников
+        self.rounds = RoundHistory(self._index)
+        self._max_rounds = self._get_max_rounds_limit()  # Сохраняем максимальное количество раундов
+        # Нижняя граница числа раундов и состав с рассадкой (участники, столы, места),
+        # для которых она посчитана: пересчитывается, когда меняется хотя бы одно из них
+        self._rounds_lower_bound = 0
+        self._rounds_lower_bound_shape: Optional[Tuple[int, int, int]] = None
+        self.seed = seed
+        self.workers = max(1, workers)
+        self.search_iterations = search_iterations
+        self.search_time_ms = search_time_ms
+        self.greedy_start = greedy_start
+        self.use_designs = use_designs
+        # Готовое расписание из каталога, состав участников и столы/места, к которым оно привязано
+        self._design: Optional[List[List[List[int]]]] = None
+        self._design_roster: List[int] = []
+        self._design_shape: Tuple[int, int] = (n, m)
+        # Заранее рассчитанные раунды: столы каждого раунда начиная с раунда _plan_start
+        self._plan: Optional[List[List[List[int]]]] = None
+        self._plan_start = 0
+        self._plan_shape: Tuple[int, int] = (n, m)
+        self._plan_time_budget_ms: Optional[int] = None
+        self._plan_attempts = 1000
+        self.schedule_cache = schedule_cache
+        self.verbose = True
+        # Причина остановки и число попыток последнего поиска рассадки
+        self.last_search_report: Optional[Dict] = None
+        self._rng = random.Random(seed)
+        self._executor: Optional[Executor] = executor
+        self._owns_executor = executor is None
+        self.max_participants = max_participants
+
+    def _log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    def __getstate__(self):
+        # Пул процессов не передается в рабочие процессы
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        return state
+
+    def _get_executor(self) -> Executor:
+        """
+        Пул процессов параллельного поиска: общий, если передан, иначе собственный
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self._owns_executor = True
+        return self._executor
+
+    def close(self):
+        """
+        Останавливает собственный пул процессов параллельного поиска
+        """
+        if self._executor is not None and self._owns_executor:
+            self._executor.shutdown()
+        self._executor = None
+
+    def get_memory_usage(self) -> int:
+        """
+        Приблизительный объем памяти состояния сессии в байтах:
+        хранилище пар, история раундов, индекс повторов и счетчики участников
+
+        :return: Количество байт
+        """
+        return (
+            self.met_pairs.nbytes()
+            + self.rounds.nbytes()
+            + len(self._repeated_pairs) * PAIR_ENTRY_BYTES
+            + len(self._index) * PARTICIPANT_ENTRY_BYTES
+        )
     
-    # Вычисляем оптимальное количество столов
-    # Учитываем, что за столом должно быть минимум 2 человека
-    max_possible_tables = min(num_tables, total_participants // 2)
-    if max_possible_tables == 0:
-        return []
-        
-    # Создаем пустые столы
-    tables = [[] for _ in range(max_possible_tables)]
-    remaining_participants = participants.copy()
+    def _register_participant(self, participant: int) -> bool:
+        """
+        Регистрирует участника в хранилище пар и индексе встреч за O(n).
+        Вернувшийся участник сохраняет свои прошлые встречи
+
+        :return: True, если участник новый для текущего состава
+        """
+        if participant in self._meetings:
+            self.met_pairs.add_participant(participant)
+            return False
+        if self.max_participants is not None and len(self._meetings) >= self.max_participants:
+            raise ValueError(f"Участников больше допустимого для сессии: {self.max_participants}")
+        self.met_pairs.add_participant(participant)
+        meetings = 0
+        for other in self._meetings:
+            if self.met_pairs.has_met(participant, other):
+                if self._meetings[other] == 0:
+                    self._met_users += 1
+                self._meetings[other] += 1
+                meetings += 1
+        self._meetings[participant] = meetings
+        self._met_pairs_active += meetings
+        if meetings > 0:
+            self._met_users += 1
+        return True
+
+    def _on_roster_changed(self):
+        """
+        Состав изменился - готовое расписание и план больше не подходят,
+        а максимальное количество раундов может вырасти
+        """
+        self._design = None
+        self._plan = None
+        self.p = len(self.participants)
+        self._max_rounds = max(self._max_rounds, self._get_max_rounds_limit())
+
+    def add_participant(self, new_participant: int):
+        """
+        Добавить участника в сессию за O(n). Повторное добавление текущего участника ничего не меняет.
+        У новичка меньше встреч, поэтому поиск рассадки сразу ставит его в приоритет
+
+        :param new_participant: Новый участник
+        """
+        if self._register_participant(new_participant):
+            self.participants.append(new_participant)
+            self._on_roster_changed()
     
-    # Сначала обеспечиваем минимум 2 человека за каждым столом
-    for table in tables:
-        if len(remaining_participants) >= 2:
-            # Добавляем двух случайных участников
-            for _ in range(2):
-                participant = random.choice(remaining_participants)
-                table.append(participant)
-                remaining_participants.remove(participant)
-        else:
-            break
+    def add_participants(self, new_participants: List[int]):
+        """
+        Добавить новых участников в сессию, O(n) на каждого
+        
+        :param new_participants: Список новых участников
+        """
+        added = False
+        for participant in new_participants:
+            if self._register_participant(participant):
+                self.participants.append(participant)
+                added = True
+        if added:
+            self._on_roster_changed()
     
-    # Удаляем столы, где не набралось 2 человека
-    tables = [table for table in tables if len(table) >= 2]
+    def remove_participant(self, participant: int):
+        """
+        Убрать участника из сессии за O(n). Его встречи остаются в хранилище пар
+        на случай возвращения, но больше не учитываются в покрытии и счетчиках встреч
+
+        :param participant: Участник
+        """
+        if participant not in self._meetings:
+            return
+        self.participants.remove(participant)
+        meetings = self._meetings.pop(participant)
+        self._met_pairs_active -= meetings
+        if meetings > 0:
+            self._met_users -= 1
+        # Убираем участника из индекса встреч тех, с кем он встречался
+        for other in self._meetings:
+            if self.met_pairs.has_met(participant, other):
+                self._meetings[other] -= 1
+                if self._meetings[other] == 0:
+                    self._met_users -= 1
+        self._on_roster_changed()
+
+    def get_meetings_count(self, participant: int) -> int:
+        """
+        Количество текущих участников, с которыми участник уже встретился, за O(1)
+        """
+        return self._meetings.get(participant, 0)
+
+    def get_unmet_count(self, participant: int) -> int:
+        """
+        Количество текущих участников, с которыми участник еще не встречался, за O(1)
+        """
+        if participant not in self._meetings:
+            return 0
+        return len(self._meetings) - 1 - self._meetings[participant]
+
+    def get_total_pairs_count(self) -> int:
+        """
+        Количество всех возможных пар участников n·(n−1)/2 без перечисления пар
+
+        :return: Количество пар
+        """
+        participants_count = len(self._meetings)
+        return participants_count * (participants_count - 1) // 2
+
+    def get_met_pairs_count(self) -> int:
+        """
+        Количество встреченных пар среди текущих участников за O(1).
+        Пары ушедших участников остаются в met_pairs, но здесь не учитываются
+
+        :return: Количество пар
+        """
+        return self._met_pairs_active
+
+    def get_all_pairs(self) -> Iterator[FrozenSet[int]]:
+        """
+        Перечисляет все возможные пары участников по одной. Пары не собираются
+        в множество: для подсчета используйте get_total_pairs_count
+        
+        :return: Генератор всех возможных пар
+        """
+        return (frozenset(pair) for pair in itertools.combinations(self._meetings, 2))
     
-    # Распределяем оставшихся участников
-    while remaining_participants:
-        # Находим столы с наименьшим количеством участников
-        min_size = min(len(table) for table in tables)
-        available_tables = [i for i, table in enumerate(tables) if len(table) < seats_per_table and len(table) == min_size]
+    def _get_unpaired_participants(self) -> Iterator[FrozenSet[int]]:
+        """
+        Перечисляет по одной пары участников, которые еще не встречались
+        """
+        has_met = self.met_pairs.has_met
+        return (
+            frozenset(pair) for pair in itertools.combinations(self._meetings, 2)
+            if not has_met(*pair)
+        )
+
+    def _count_new_pairs(self, tables: List[List[int]]) -> int:
+        """
+        Считает пары за столами, которые еще не встречались.
+        Стоимость O(сумма квадратов размеров столов)
+
+        :param tables: Список столов с участниками
+        :return: Количество новых пар
+        """
+        has_met = self.met_pairs.has_met
+        new_pairs = 0
+        for table in tables:
+            for first, second in _table_pairs(table):
+                if not has_met(first, second):
+                    new_pairs += 1
+        return new_pairs
+
+    def _evaluate_table_configuration(self, tables: List[List[int]]) -> int:
+        """
+        Оценивает конфигурацию столов по количеству новых пар и их приоритету.
+
+        Приоритетные пары - это все еще не встречавшиеся пары текущих участников,
+        поэтому каждая новая пара одновременно приоритетная и получает
+        NEW_PAIR_WEIGHT + PRIORITY_PAIR_WEIGHT. Состояние встреч обновляется
+        один раз при фиксации раунда, а оценка не перебирает все O(n²) пары
         
-        if not available_tables:
-            # Если все столы заполнены до максимума, но есть минимум 2 участника,
-            # создаем новый стол (если не превышен лимит столов)
-            if len(remaining_participants) >= 2 and len(tables) < num_tables:
-                new_table = []
-                for _ in range(2):
-                    participant = random.choice(remaining_participants)
-                    new_table.append(participant)
-                    remaining_participants.remove(participant)
-                tables.append(new_table)
+        :param tables: Список столов с участниками
+        :return: Оценка конфигурации (чем выше, тем лучше)
+        """
+        new_pairs = self._count_new_pairs(tables)
+
+        # Штрафуем за неравномерное распределение
+        min_size = min(len(table) for table in tables)
+        max_size = max(len(table) for table in tables)
+        size_diff_penalty = (max_size - min_size) * SIZE_DIFF_PENALTY
+
+        return new_pairs * (NEW_PAIR_WEIGHT + PRIORITY_PAIR_WEIGHT) - size_diff_penalty
+
+    def _commit_round(self, tables: List[List[int]]) -> Dict[int, int]:
+        """
+        Фиксирует рассадку как новый раунд и обновляет состояние встреч
+
+        :param tables: Список столов с участниками
+        :return: Словарь {участник: номер_стола}
+        """
+        round_dict = {}
+        new_pairs_count = 0
+        for table_idx, table in enumerate(tables):
+            for participant in table:
+                round_dict[participant] = table_idx
+            # Добавляем новые пары в множество встреченных
+            for first, second in _table_pairs(table):
+                if not self.met_pairs.add_pair(first, second):
+                    pair = (first, second) if first < second else (second, first)
+                    self._repeated_pairs[pair] = self._repeated_pairs.get(pair, 1) + 1
+                    self._total_repeated_meetings += 1
+                else:
+                    new_pairs_count += 1
+                    if first in self._meetings and second in self._meetings:
+                        for participant in (first, second):
+                            if self._meetings[participant] == 0:
+                                self._met_users += 1
+                            self._meetings[participant] += 1
+                        self._met_pairs_active += 1
+
+        self._log(f"DEBUG: Добавлено {new_pairs_count} новых пар в раунде")
+        self.rounds.append(round_dict)
+        return round_dict
+
+    def generate_candidate_batch(self, count: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        Генерирует пачку случайных рассадок одним массивом.
+        Столбцы соответствуют участникам в порядке get_batch_participants(),
+        значение - номер стола или -1, если участнику не хватило места.
+        Меньше встреч - выше шанс получить место
+
+        :param count: Количество рассадок
+        :param rng: Генератор случайных чисел NumPy
+        :return: Массив формы (count, участники)
+        """
+        participants = self.get_batch_participants()
+        total = len(participants)
+        sizes = get_table_sizes(total, self.n, self.m)
+        seated_count = sum(sizes)
+        labels = np.repeat(np.arange(len(sizes)), sizes)
+
+        if seated_count < total:
+            # Мест не хватает всем: сначала отбираем участников с наименьшим числом встреч
+            meetings = np.array([self._meetings[p] for p in participants], dtype=np.float64)
+            priority = np.argsort(meetings + rng.random((count, total)), axis=1)
+            seated = priority[:, :seated_count]
+            shuffle = np.argsort(rng.random((count, seated_count)), axis=1)
+            seated = np.take_along_axis(seated, shuffle, axis=1)
+        else:
+            seated = np.argsort(rng.random((count, total)), axis=1)
+
+        assignments = np.full((count, total), -1, dtype=np.int64)
+        np.put_along_axis(assignments, seated, labels[None, :], axis=1)
+        return assignments
+
+    def evaluate_candidate_batch(self, assignments: np.ndarray) -> np.ndarray:
+        """
+        Оценивает пачку рассадок операциями над массивами.
+        Результат совпадает с _evaluate_table_configuration для каждой рассадки
+
+        :param assignments: Массив (рассадки, участники) с номерами столов, -1 - без места
+        :return: Массив оценок
+        """
+        participants = self.get_batch_participants()
+        dense = np.array([self._index.get(p) for p in participants], dtype=np.int64)
+        cells = self.met_pairs.as_array()
+        count, total = assignments.shape
+        tables_count = int(assignments.max()) + 1 if assignments.size else 0
+        scores = np.zeros(count, dtype=np.int64)
+        if tables_count == 0:
+            return scores
+
+        # Размеры столов каждой рассадки
+        seated = assignments >= 0
+        flat = (assignments + np.arange(count)[:, None] * tables_count)[seated]
+        sizes = np.bincount(flat, minlength=count * tables_count).reshape(count, tables_count)
+
+        # Рассадки с одинаковым набором размеров столов имеют одинаковые позиции пар
+        profiles, inverse = np.unique(sizes, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for profile_idx, profile in enumerate(profiles):
+            rows = np.nonzero(inverse == profile_idx)[0]
+            unseated = total - int(profile.sum())
+            first_pos, second_pos = _profile_pair_positions(profile, unseated)
+            # Упорядочиваем участников по номеру стола: неусаженные (-1) окажутся в начале
+            order = np.argsort(assignments[rows], axis=1, kind='stable')
+            first = dense[order[:, first_pos]]
+            second = dense[order[:, second_pos]]
+            low = np.minimum(first, second)
+            high = np.maximum(first, second)
+            met = cells[high * (high - 1) // 2 + low] != 0
+            new_pairs = len(first_pos) - met.sum(axis=1)
+            non_empty = profile[profile > 0]
+            size_diff_penalty = (int(non_empty.max()) - int(non_empty.min())) * SIZE_DIFF_PENALTY
+            scores[rows] = new_pairs * (NEW_PAIR_WEIGHT + PRIORITY_PAIR_WEIGHT) - size_diff_penalty
+        return scores
+
+    def get_batch_participants(self) -> List[int]:
+        """
+        Участники в порядке столбцов пакетных рассадок
+        """
+        return list(self._meetings)
+
+    def assignment_to_tables(self, assignment: np.ndarray) -> List[List[int]]:
+        """
+        Преобразует строку пакетной рассадки в список столов
+
+        :param assignment: Номера столов участников, -1 - без места
+        :return: Список столов с участниками
+        """
+        participants = self.get_batch_participants()
+        tables = [[] for _ in range(int(assignment.max()) + 1)]
+        for participant, table_idx in zip(participants, assignment.tolist()):
+            if table_idx >= 0:
+                tables[table_idx].append(participant)
+        return [table for table in tables if table]
+
+    def _random_search(self, budget: 'SearchBudget'):
+        """
+        Перебирает случайные рассадки по одной и выбирает лучшую
+
+        :param budget: Условия остановки поиска
+        :return: (лучшая рассадка, ее оценка)
+        """
+        best_tables = None
+        best_score = float('-inf')
+        best_new_pairs = None
+
+        while not budget.exhausted():
+            # Сортируем участников по количеству встреч (меньше встреч - выше приоритет)
+            shuffled_participants = sorted(
+                self.participants,
+                key=lambda p: (self._meetings[p], self._rng.random())
+            )
+            
+            # Используем функцию распределения по столам
+            tables = split_into_tables(shuffled_participants, self.n, self.m, rng=self._rng)
+            
+            # Оцениваем конфигурацию
+            score = self._evaluate_table_configuration(tables)
+            
+            improved = score > best_score
+            if improved:
+                best_score = score
+                best_tables = tables
+                best_new_pairs = self._count_new_pairs(tables)
+
+            # Если нашли идеальную конфигурацию, цикл остановится по верхней границе
+            budget.record(1, best_new_pairs, improved)
+
+        return best_tables, best_score
+
+    def _batch_search(self, budget: 'SearchBudget'):
+        """
+        Генерирует и оценивает рассадки пачками по BATCH_SIZE
+
+        :param budget: Условия остановки поиска
+        :return: (лучшая рассадка, ее оценка)
+        """
+        if len(get_table_sizes(len(self._meetings), self.n, self.m)) == 0:
+            return None, float('-inf')
+
+        rng = np.random.default_rng(self._rng.getrandbits(64))
+        best_assignment = None
+        best_score = float('-inf')
+        best_new_pairs = None
+        while not budget.exhausted():
+            remaining = budget.remaining_attempts()
+            count = BATCH_SIZE if remaining is None else min(BATCH_SIZE, remaining)
+            assignments = self.generate_candidate_batch(count, rng)
+            scores = self.evaluate_candidate_batch(assignments)
+            best_idx = int(np.argmax(scores))
+            improved = scores[best_idx] > best_score
+            if improved:
+                best_score = int(scores[best_idx])
+                best_assignment = assignments[best_idx]
+                best_new_pairs = self._count_new_pairs(self.assignment_to_tables(best_assignment))
+            budget.record(count, best_new_pairs, improved)
+
+        if best_assignment is None:
+            return None, best_score
+        return self.assignment_to_tables(best_assignment), best_score
+
+    def _local_search(self, tables: List[List[int]], budget: 'SearchBudget'):
+        """
+        Улучшает рассадку обменами и пересадками участников между столами
+        методом имитации отжига. Изменение оценки хода считается за O(размер стола),
+        ограничения 2..m человек за столом соблюдаются, а размеры столов не
+        расходятся больше чем на 1. Не поместившиеся участники лежат в отдельной
+        группе и участвуют в обменах, но севший участник не пересаживается в нее
+
+        :param tables: Начальная рассадка
+        :param budget: Условия остановки поиска, попытка - один ход
+        :return: (лучшая рассадка, ее оценка)
+        """
+        if not tables:
+            return tables, float('-inf')
+
+        has_met = self.met_pairs.has_met
+        rng = self._rng
+        seats = max(self.m, 2)
+        seated = set(p for table in tables for p in table)
+        groups = [list(table) for table in tables]
+        groups.append([p for p in dict.fromkeys(self.participants) if p not in seated])
+        bench = len(groups) - 1
+        size_counts = {}
+        for table in tables:
+            size_counts[len(table)] = size_counts.get(len(table), 0) + 1
+
+        def unmet(participant: int, group: int, exclude: Optional[int]) -> int:
+            if group == bench:
+                return 0
+            count = 0
+            for other in groups[group]:
+                if other != participant and other != exclude and not has_met(participant, other):
+                    count += 1
+            return count
+
+        def size_spread() -> int:
+            sizes = [size for size, count in size_counts.items() if count > 0]
+            return max(sizes) - min(sizes)
+
+        def resize(old_size: int, new_size: int):
+            size_counts[old_size] -= 1
+            size_counts[new_size] = size_counts.get(new_size, 0) + 1
+
+        pair_weight = NEW_PAIR_WEIGHT + PRIORITY_PAIR_WEIGHT
+        current_score = self._evaluate_table_configuration(tables)
+        current_new_pairs = self._count_new_pairs(tables)
+        best_score = current_score
+        best_new_pairs = current_new_pairs
+        best_groups = None  # None - текущая рассадка и есть лучшая
+        start_temperature = float(pair_weight)
+
+        budget.record(0, best_new_pairs)
+        while not budget.exhausted():
+            temperature = start_temperature * (1 - budget.progress()) + 1
+            budget.record(1)
+
+            first_group = rng.randrange(len(groups))
+            second_group = rng.randrange(len(groups))
+            if first_group == second_group or not groups[first_group]:
                 continue
+            first = rng.choice(groups[first_group])
+            first_size = len(groups[first_group])
+            second_size = len(groups[second_group])
+
+            move = not groups[second_group] or rng.random() < LOCAL_SEARCH_MOVE_PROBABILITY
+            if move:
+                # Пересадка: стол-источник не опустеет ниже 2, стол-приемник не переполнится.
+                # Пересадка на скамейку освободила бы место, а сидеть должны все, кто помещается
+                if second_group == bench:
+                    continue
+                if first_group != bench and first_size <= 2:
+                    continue
+                if second_size >= seats:
+                    continue
+                second = None
+                delta_pairs = unmet(first, second_group, None) - unmet(first, first_group, None)
+                old_spread = size_spread()
+                if first_group != bench:
+                    resize(first_size, first_size - 1)
+                resize(second_size, second_size + 1)
+                new_spread = size_spread()
+                if new_spread > max(old_spread, 1):
+                    # Столы разошлись бы по размеру больше чем на 1
+                    if first_group != bench:
+                        resize(first_size - 1, first_size)
+                    resize(second_size + 1, second_size)
+                    continue
+                delta = delta_pairs * pair_weight - (new_spread - old_spread) * SIZE_DIFF_PENALTY
             else:
-                # Добавляем оставшихся участников к существующим столам
-                for participant in remaining_participants[:]:
-                    for table in tables:
-                        if len(table) < seats_per_table:
-                            table.append(participant)
-                            remaining_participants.remove(participant)
-                            break
+                second = rng.choice(groups[second_group])
+                delta_pairs = (
+                    unmet(first, second_group, second) + unmet(second, first_group, first)
+                    - unmet(first, first_group, None) - unmet(second, second_group, None)
+                )
+                delta = delta_pairs * pair_weight
+
+            if delta < 0 and rng.random() >= math.exp(delta / temperature):
+                if move:
+                    # Откатываем изменение размеров столов
+                    if first_group != bench:
+                        resize(first_size - 1, first_size)
+                    resize(second_size + 1, second_size)
+                continue
+
+            if delta < 0 and best_groups is None:
+                # Запоминаем лучшую рассадку перед ухудшающим ходом
+                best_groups = [list(group) for group in groups]
+
+            groups[first_group].remove(first)
+            groups[second_group].append(first)
+            if second is not None:
+                groups[second_group].remove(second)
+                groups[first_group].append(second)
+            current_score += delta
+            current_new_pairs += delta_pairs
+
+            if current_score > best_score:
+                best_score = current_score
+                best_new_pairs = current_new_pairs
+                best_groups = None
+                budget.record(0, best_new_pairs, improved=True)
+
+        result = best_groups if best_groups is not None else groups
+        result_tables = [group for group in result[:bench] if group]
+        return result_tables, self._evaluate_table_configuration(result_tables)
+
+    def _unmet_row(self, participant: int, others: List[int], others_dense: Optional[np.ndarray], cells: Optional[np.ndarray]) -> np.ndarray:
+        """
+        Для каждого из others - 1, если участник с ним еще не встречался
+
+        :param participant: id участника
+        :param others: Список других участников
+        :param others_dense: Плотные индексы others (только для матричного хранилища)
+        :param cells: Матрица встреч в виде массива (только для матричного хранилища)
+        :return: Массив 0/1 длины len(others)
+        """
+        if cells is None:
+            has_met = self.met_pairs.has_met
+            return np.fromiter((not has_met(participant, other) for other in others), dtype=np.int32, count=len(others))
+        idx = self._index.get(participant)
+        low = np.minimum(others_dense, idx)
+        high = np.maximum(others_dense, idx)
+        return (cells[high * (high - 1) // 2 + low] == 0).astype(np.int32)
+
+    def _greedy_seating(self) -> List[List[int]]:
+        """
+        Жадная рассадка: участники с наименьшим числом встреч садятся первыми,
+        каждый - за открытый стол, где незнакомых больше всего по сравнению со знакомыми:
+        пустой стол лучше стола со знакомыми, поэтому столы открываются раньше, чем
+        заполняются. Равенства разрешаются генератором планировщика, чтобы одни и те же
+        участники не садились вместе каждый раунд. Для каждого еще не посаженного участника
+        поддерживается число незнакомых за каждым столом, поэтому выбор стола стоит
+        O(столы), а посадка - O(n)
+
+        :return: Список столов с участниками
+        """
+        # Перемешиваем, а sorted устойчив: при равном числе встреч порядок случайный
+        participants = list(self._meetings)
+        self._rng.shuffle(participants)
+        participants.sort(key=lambda p: self._meetings[p])
+        sizes = get_table_sizes(len(participants), self.n, self.m)
+        if not sizes:
+            return []
+        seated = participants[:sum(sizes)]
+
+        if self.pair_backend == PairBackend.matrix:
+            cells = self.met_pairs.as_array()
+            dense = np.array([self._index.get(p) for p in seated], dtype=np.int64)
+        else:
+            cells = None
+            dense = None
+
+        capacities = np.array(sizes, dtype=np.int64)
+        occupancy = np.zeros(len(sizes), dtype=np.int64)
+        # unmet_counts[i, t] - сколько незнакомых участнику seated[i] уже сидит за столом t
+        unmet_counts = np.zeros((len(seated), len(sizes)), dtype=np.int64)
+        tables = [[] for _ in sizes]
+
+        for position, participant in enumerate(seated):
+            # Незнакомые минус знакомые за столом, при равенстве - менее заполненный стол,
+            # затем случайный из равных
+            keys = (2 * unmet_counts[position] - occupancy) * (len(seated) + 1) - occupancy
+            keys[occupancy >= capacities] = np.iinfo(np.int64).min
+            candidates = np.flatnonzero(keys == keys.max())
+            table_idx = int(candidates[self._rng.randrange(len(candidates))])
+            tables[table_idx].append(participant)
+            occupancy[table_idx] += 1
+
+            rest = position + 1
+            if rest < len(seated):
+                unmet_counts[rest:, table_idx] += self._unmet_row(
+                    participant,
+                    seated[rest:],
+                    dense[rest:] if dense is not None else None,
+                    cells)
+
+        return tables
+
+    def _next_design_round(self) -> Optional[List[List[int]]]:
+        """
+        Следующий раунд готового расписания из каталога дизайнов.
+        Расписание выбирается только в начале сессии и сбрасывается
+        при любом изменении состава участников, числа столов или мест
+
+        :return: Список столов с участниками или None, если дизайн не применим
+        """
+        if not self.use_designs:
+            return None
+        if self._design is not None and self._design_shape != (self.n, self.m):
+            self._design = None
+        if self._design is None:
+            if self.rounds:
+                return None
+            roster = list(self._meetings)
+            design = get_resolvable_design(len(roster), self.m)
+            if design is None or len(design[0]) > self.n:
+                return None
+            self._design = design
+            self._design_roster = roster
+            self._design_shape = (self.n, self.m)
+
+        round_idx = len(self.rounds)
+        if round_idx >= len(self._design):
+            return None
+        return [[self._design_roster[point] for point in block] for block in self._design[round_idx]]
+
+    def plan_session(self, time_budget_ms: int = 2000, attempts: int = 1000) -> List[Dict[int, int]]:
+        """
+        Рассчитывает все оставшиеся раунды сессии для текущего состава участников.
+        Пока позволяет бюджет времени, строятся полные расписания с разными потоками
+        случайных чисел и выбирается то, что дает наибольшее покрытие пар за меньшее
+        число раундов с меньшим числом повторов. Если бюджета не хватило даже на одно
+        полное расписание, план содержит успевшие раунды, а следующие подбираются по
+        одному. После вызова generate_next_round берет раунды из плана, а при входе
+        или выходе участников план пересчитывается
+
+        :param time_budget_ms: Бюджет времени на расчет в миллисекундах
+        :param attempts: Количество попыток поиска на каждый раунд
+        :return: Список запланированных раундов {участник: номер_стола}
+        """
+        self._plan_time_budget_ms = time_budget_ms
+        self._plan_attempts = attempts
+        return self._build_plan(time_budget_ms, attempts)
+
+    def _build_plan(self, time_budget_ms: float, attempts: int) -> List[Dict[int, int]]:
+        """
+        Рассчитывает план сессии за time_budget_ms (plan_session).
+        Поиск каждого раунда ограничен оставшимся временем бюджета
+        """
+        # План не зависит от id участников и может быть взят из кэша, если состав
+        # не менялся с начала сессии: сыгранные раунды входят в ключ кэша
+        roster = list(self._meetings)
+        cacheable = self.schedule_cache is not None and (not self.rounds or self.rounds.ids == roster)
+        if cacheable:
+            cached = self.schedule_cache.get(len(roster), self.n, self.m, self.seed, self._plan_cache_version(attempts))
+            if cached is not None:
+                self._set_plan([_positions_to_tables(positions, roster) for positions in cached])
+                self._log(f"DEBUG: План из {len(self._plan)} раундов взят из кэша")
+                return self._plan_rounds()
+
+        deadline = time.perf_counter() + time_budget_ms / 1000
+
+        best_plan = None
+        best_key = None
+        complete = True
+        plan_pass = 0
+        while best_plan is None or time.perf_counter() < deadline:
+            planner = copy.deepcopy(self)
+            planner.verbose = False
+            planner._plan = None
+            planner._plan_time_budget_ms = None
+            planner._rng = random.Random(f"{self.seed}:plan:{len(self.rounds)}:{plan_pass}")
+            if self.workers > 1 and self.engine != SearchEngine.greedy:
+                # Проходы плана используют пул процессов планировщика и не создают свой
+                planner._executor = self._get_executor()
+                planner._owns_executor = False
+            plan = []
+            while True:
+                remaining_ms = (deadline - time.perf_counter()) * 1000
+                if remaining_ms <= 0:
+                    complete = False
+                    break
+                round_dict = planner.generate_next_round(attempts, deadline_ms=remaining_ms)
+                if round_dict is None:
+                    report = planner.last_search_report
+                    complete = not (report is not None and report['stop_reason'] == StopReason.deadline.value)
+                    break
+                plan.append(_round_to_tables(round_dict))
+            planner.close()
+
+            if not complete:
+                # Бюджет закончился посреди прохода: неполное расписание нужно,
+                # только если полного нет, дальше раунды подбираются по одному
+                if best_plan is None:
+                    best_plan = plan
+                    complete = False
+                else:
+                    complete = True
                 break
-        
-        # Выбираем случайный стол из доступных
-        table_idx = random.choice(available_tables)
-        participant = random.choice(remaining_participants)
-        tables[table_idx].append(participant)
-        remaining_participants.remove(participant)
-    
-    return tables
 
-class SessionScheduler:
-    def __init__(self, participants: List[int], n: int, m: int):
+            # Больше пар, меньше раундов, меньше повторов
+            key = (len(planner.met_pairs), -len(plan), -planner.check_repeated_meetings()['total_repeated_meetings'])
+            if best_key is None or key > best_key:
+                best_plan = plan
+                best_key = key
+            plan_pass += 1
+            if planner._design is not None:
+                # Расписание из каталога дизайнов уже оптимально
+                break
+
+        self._set_plan(best_plan)
+        if not complete:
+            self._log(f"DEBUG: За {time_budget_ms:.0f} мс рассчитано {len(best_plan)} раундов плана, "
+                      f"следующие раунды подбираются по одному")
+            return self._plan_rounds()
+        self._log(f"DEBUG: Рассчитан план из {len(best_plan)} раундов за {plan_pass} проход(ов)")
+        if cacheable:
+            self.schedule_cache.put(
+                len(roster), self.n, self.m, self.seed, self._plan_cache_version(attempts),
+                [_tables_to_positions(tables, roster) for tables in best_plan])
+        return self._plan_rounds()
+
+    def _plan_cache_version(self, attempts: int) -> str:
         """
-        Инициализация планировщика сессии
-        
-        :param participants: Список участников
-        :param n: Количество столов
-        :param m: Количество мест за столом
+        Версия алгоритма для ключа кэша планов: все настройки планировщика,
+        от которых зависит рассчитанный план, и отпечаток сыгранных раундов
         """
-        self.participants = participants.copy()
-        self.n = n
-        self.m = m
-        self.p = n * m
-        self.met_pairs = set()
-        self.rounds = []
-        self._max_rounds = get_max_rounds(len(participants), m)  # Сохраняем максимальное количество раундов
-        random.seed(random_seed_num)
-    
-    def add_participant(self, new_participant: int):
-        self.participants.append(new_participant)
-        self.p = len(self.participants)
-        # Обновляем максимальное количество раундов при добавлении участника
-        new_max_rounds = get_max_rounds(len(self.participants), self.m)
-        self._max_rounds = max(self._max_rounds, new_max_rounds)
-    
-    def add_participants(self, new_participants: List[int]):
+        history = hashlib.sha256()
+        for round_idx in range(len(self.rounds)):
+            history.update(self.rounds.as_array(round_idx).tobytes())
+        return ":".join(str(value) for value in (
+            ENGINE_VERSION,
+            self.engine.value,
+            self.pair_backend.value,
+            f"designs={int(self.use_designs)}",
+            f"greedy={int(self.greedy_start)}",
+            f"workers={self.workers}",
+            f"attempts={attempts}",
+            f"iterations={self.search_iterations}",
+            f"time={self.search_time_ms}",
+            f"history={history.hexdigest()[:16] if self.rounds else None}"
+        ))
+
+    def _set_plan(self, plan: List[List[List[int]]]):
+        self._plan = plan
+        self._plan_start = len(self.rounds)
+        self._plan_shape = (self.n, self.m)
+
+    def _plan_rounds(self) -> List[Dict[int, int]]:
+        return [
+            {participant: table_idx for table_idx, table in enumerate(tables) for participant in table}
+            for tables in self._plan
+        ]
+
+    def _next_planned_round(self, deadline_ms: Optional[float] = None) -> Optional[List[List[int]]]:
         """
-        Добавить новых участников в сессию
-        
-        :param new_participants: Список новых участников
+        Следующий раунд из плана сессии. Если план сброшен из-за изменения
+        состава участников, он рассчитывается заново с прежним бюджетом времени,
+        но не дольше срока раунда
+
+        :param deadline_ms: Срок генерации раунда в миллисекундах
+        :return: Список столов с участниками или None, если плана нет
         """
-        self.participants.extend(new_participants)
-        self.p = len(self.participants)
-        # Обновляем максимальное количество раундов при добавлении участников
-        new_max_rounds = get_max_rounds(len(self.participants), self.m)
-        self._max_rounds = max(self._max_rounds, new_max_rounds)
-    
-    def remove_participant(self, participant: int):
-        self.participants.remove(participant)
-        self.p = len(self.participants)
+        if self._plan_time_budget_ms is None:
+            return None
+        if self._plan is None or self._plan_shape != (self.n, self.m):
+            time_budget_ms = self._plan_time_budget_ms
+            if deadline_ms is not None:
+                time_budget_ms = min(time_budget_ms, deadline_ms)
+            self._build_plan(time_budget_ms, self._plan_attempts)
 
-    def get_all_pairs(self) -> Set[FrozenSet[int]]:
+        round_idx = len(self.rounds) - self._plan_start
+        if round_idx < 0 or round_idx >= len(self._plan):
+            return None
+        return self._plan[round_idx]
+
+    def _make_budget(self, attempts: Optional[int], deadline_ms: Optional[int] = None, plateau_window: Optional[int] = None) -> 'SearchBudget':
         """
-        Получить все возможные пары участников
-        
-        :return: Множество всех возможных пар
+        Условия остановки поиска для выбранного алгоритма
+
+        :param attempts: Количество попыток или None - без ограничения
+        :param deadline_ms: Ограничение времени в миллисекундах
+        :param plateau_window: Остановка, если столько попыток подряд нет улучшения
         """
-        return set(frozenset(pair) for pair in itertools.combinations(self.participants, 2))
-    
-    def _get_unpaired_participants(self) -> Set[FrozenSet[int]]:
+        if self.engine == SearchEngine.local_search:
+            # Для локального поиска попытка - один ход
+            if attempts is not None:
+                attempts = self.search_iterations or attempts * LOCAL_SEARCH_ITERATIONS_PER_ATTEMPT
+            if self.search_time_ms is not None:
+                deadline_ms = self.search_time_ms if deadline_ms is None else min(deadline_ms, self.search_time_ms)
+        return SearchBudget(
+            attempts=attempts,
+            deadline_ms=deadline_ms,
+            plateau_window=plateau_window,
+            target_new_pairs=self.get_new_pairs_upper_bound())
+
+    def _get_max_rounds_limit(self) -> int:
         """
-        Возвращает множество пар участников, которые еще не встречались
+        Ограничение числа раундов сессии: оценка get_max_rounds, но не меньше
+        нижней границы, иначе при нехватке мест сессия закончится раньше, чем все встретятся
         """
-        all_pairs = self.get_all_pairs()
-        return all_pairs - self.met_pairs
+        participants_count = len(self.participants)
+        return max(
+            get_max_rounds(participants_count, self.m),
+            get_round_lower_bounds(participants_count, self.n, self.m)['best'])
 
-    def _evaluate_table_configuration(self, tables: List[List[int]]) -> int:
+    def get_rounds_lower_bound(self) -> int:
         """
-        Оценивает конфигурацию столов по количеству новых пар и их приоритету
-        
-        :param tables: Список столов с участниками
-        :return: Оценка конфигурации (чем выше, тем лучше)
+        Нижняя граница числа раундов для текущего состава (get_round_lower_bounds).
+        Кэшируется и пересчитывается, если изменилось число участников, столов
+        или мест - в том числе когда n и m меняют снаружи
+
+        :return: Количество раундов
         """
-        score = 0
-        new_pairs = set()
-        unpaired = self._get_unpaired_participants()
-        
-        # Подсчитываем новые пары для каждого стола
-        for table in tables:
-            table_pairs = set()
-            for i in range(len(table)):
-                for j in range(i+1, len(table)):
-                    pair = frozenset([table[i], table[j]])
-                    table_pairs.add(pair)
-                    if pair not in self.met_pairs:
-                        new_pairs.add(pair)
-                        # Даем больший вес парам, которые еще не встречались
-                        score += 100
-                        
-        # Штрафуем за неравномерное распределение
-        min_size = min(len(table) for table in tables)
-        max_size = max(len(table) for table in tables)
-        size_diff_penalty = (max_size - min_size) * 10
-        score -= size_diff_penalty
-        
-        # Поощряем использование приоритетных пар
-        priority_pairs = 0
-        for pair in new_pairs:
-            if pair in unpaired:
-                priority_pairs += 1
-        score += priority_pairs * 50
-        
-        return score
+        shape = (len(self._meetings), self.n, self.m)
+        if shape != self._rounds_lower_bound_shape:
+            self._rounds_lower_bound = get_round_lower_bounds(*shape)['best']
+            self._rounds_lower_bound_shape = shape
+        return self._rounds_lower_bound
+
+    def get_remaining_rounds_lower_bound(self) -> int:
+        """
+        Нижняя граница числа раундов, за которые могут встретиться все оставшиеся пары
+        текущих участников, за O(n): по оставшимся парам, по участнику с наибольшим
+        числом незнакомых и по числу мест за раунд
+
+        :return: Количество раундов
+        """
+        participants_count = len(self._meetings)
+        unmet_pairs = self.get_total_pairs_count() - self.get_met_pairs_count()
+        sizes = get_table_sizes(participants_count, self.n, self.m)
+        if unmet_pairs <= 0 or not sizes:
+            return 0
+        per_table = min(max(self.m, 2), participants_count) - 1
+        # Сколько раундов за столом нужно каждому участнику, чтобы встретить всех незнакомых
+        seated_rounds = [math.ceil(self.get_unmet_count(participant) / per_table) for participant in self._meetings]
+        return max(
+            math.ceil(unmet_pairs / get_max_pairs_per_round(participants_count, self.n, self.m)),
+            max(seated_rounds),
+            math.ceil(sum(seated_rounds) / sum(sizes)))
+
+    def get_new_pairs_upper_bound(self) -> int:
+        """
+        Верхняя граница числа новых пар в следующем раунде: не больше оставшихся
+        незнакомых пар, не больше пар за столами равномерной рассадки (get_table_sizes),
+        которую строят все алгоритмы поиска, и не больше, чем каждый участник может
+        получить за своим столом, за O(n)
+        """
+        sizes = get_table_sizes(len(self._meetings), self.n, self.m)
+        seats = max(sizes, default=2)
+        unmet_counts = [self.get_unmet_count(participant) for participant in self._meetings]
+        unmet_pairs = sum(unmet_counts) // 2
+        per_participant = sum(min(count, seats - 1) for count in unmet_counts) // 2
+        capacity = sum(size * (size - 1) // 2 for size in sizes)
+        return min(unmet_pairs, per_participant, capacity)
+
+    def _search(self, budget: 'SearchBudget'):
+        """
+        Поиск рассадки выбранным алгоритмом в текущем процессе
+
+        :param budget: Условия остановки поиска
+        :return: (лучшая рассадка, ее оценка)
+        """
+        if self.engine == SearchEngine.greedy:
+            # Жадная рассадка строится за один проход: одной попытки достаточно
+            tables = self._greedy_seating()
+            budget.record(1, self._count_new_pairs(tables) if tables else None)
+            if not budget.exhausted():
+                budget.stop_reason = StopReason.attempts
+            return tables, (self._evaluate_table_configuration(tables) if tables else float('-inf'))
+        if self.engine == SearchEngine.local_search:
+            # Начинаем с одной рассадки и улучшаем ее обменами
+            if self.greedy_start:
+                start_tables = self._greedy_seating()
+            else:
+                start_tables, _ = self._random_search(SearchBudget(attempts=1))
+            return self._local_search(start_tables, budget)
+
+        if self.engine == SearchEngine.batch:
+            best_tables, best_score = self._batch_search(budget)
+        else:
+            best_tables, best_score = self._random_search(budget)
+        if self.greedy_start:
+            # Жадная рассадка - стартовый рекорд случайного поиска
+            greedy_tables = self._greedy_seating()
+            if greedy_tables:
+                greedy_score = self._evaluate_table_configuration(greedy_tables)
+                if greedy_score >= best_score:
+                    return greedy_tables, greedy_score
+        return best_tables, best_score
+
+    def _worker_seed(self, worker: int) -> str:
+        """
+        Зерно независимого потока случайных чисел рабочего процесса,
+        производное от зерна планировщика, номера раунда и номера процесса
+        """
+        return f"{self.seed}:{len(self.rounds)}:{worker}"
+
+    def _parallel_search(self, budget: 'SearchBudget'):
+        """
+        Делит попытки между процессами и выбирает лучшую рассадку.
+        Результат воспроизводим при одинаковых зерне и числе процессов,
+        если поиск не ограничен по времени
+
+        :param budget: Общие условия остановки поиска
+        :return: (лучшая рассадка, ее оценка)
+        """
+        executor = self._get_executor()
+
+        futures = []
+        for worker in range(self.workers):
+            if budget.attempts is None:
+                worker_attempts = None
+            else:
+                base, extra = divmod(budget.attempts, self.workers)
+                worker_attempts = base + (1 if worker < extra else 0)
+            futures.append(executor.submit(
+                _parallel_search_worker,
+                self,
+                SearchBudget(
+                    attempts=worker_attempts,
+                    deadline_ms=budget.remaining_ms(),
+                    plateau_window=budget.plateau_window,
+                    target_new_pairs=budget.target_new_pairs),
+                self._worker_seed(worker)))
+
+        # При равных оценках побеждает процесс с меньшим номером
+        best_tables = None
+        best_score = float('-inf')
+        stop_reasons = []
+        for future in futures:
+            tables, score, attempts_used, stop_reason = future.result()
+            budget.record(attempts_used)
+            stop_reasons.append(stop_reason)
+            if tables is not None and score > best_score:
+                best_tables = tables
+                best_score = score
+        if best_tables is not None:
+            budget.record(0, self._count_new_pairs(best_tables))
+        budget.stop_reason = StopReason.upper_bound if StopReason.upper_bound in stop_reasons else stop_reasons[0]
+        return best_tables, best_score
 
-    def generate_next_round(self, attempts: int = 1000) -> Optional[Dict[int, int]]:
+    def generate_next_round(
+            self,
+            attempts: Optional[int] = None,
+            deadline_ms: Optional[int] = None,
+            plateau_window: Optional[int] = None) -> Optional[Dict[int, int]]:
         """
-        Генерирует следующий раунд сессии с использованием жадного алгоритма
+        Генерирует следующий раунд сессии с использованием жадного алгоритма.
+        Поиск останавливается раньше, если найдена рассадка с верхней границей
+        новых пар. Причина остановки и число попыток сохраняются в last_search_report
         
-        :param attempts: Количество попыток для поиска оптимальной рассадки
+        :param attempts: Количество попыток для поиска оптимальной рассадки.
+            По умолчанию DEFAULT_ATTEMPTS, а при заданном deadline_ms - без ограничения
+        :param deadline_ms: Срок поиска в миллисекундах: возвращается лучшая рассадка, найденная к сроку
+        :param plateau_window: Остановка, если столько попыток подряд нет улучшения
         :return: Словарь {участник: номер_стола} или None, если не удалось создать раунд
         """
+        if attempts is None and deadline_ms is None:
+            attempts = DEFAULT_ATTEMPTS
+        self.last_search_report = None
+
         if len(self.participants) < 2:
             return None
             
         # Проверяем, не превышено ли максимальное количество раундов
         if len(self.rounds) >= self._max_rounds:
-            print(f"DEBUG: Достигнуто максимальное количество раундов ({self._max_rounds})")
+            self._log(f"DEBUG: Достигнуто максимальное количество раундов ({self._max_rounds})")
             return None
+
+        # Если сессия рассчитана заранее, просто берем следующий раунд плана
+        planned_tables = self._next_planned_round(deadline_ms)
+        if planned_tables is not None:
+            self._log(f"DEBUG: Раунд {len(self.rounds) + 1} взят из плана сессии")
+            self.last_search_report = {'source': 'plan', 'stop_reason': None, 'attempts': 0, 'elapsed_ms': 0.0}
+            return self._commit_round(planned_tables)
             
-        all_pairs = self.get_all_pairs()
+        total_pairs = self.get_total_pairs_count()
+        met_pairs = self.get_met_pairs_count()
         
         # Если все пары уже встретились, возвращаем None
-        if len(self.met_pairs) >= len(all_pairs):
-            print(f"DEBUG: Все пары уже встретились! met_pairs={len(self.met_pairs)}, all_pairs={len(all_pairs)}")
+        if met_pairs >= total_pairs:
+            self._log(f"DEBUG: Все пары уже встретились! met_pairs={met_pairs}, all_pairs={total_pairs}")
             return None
-        
-        best_tables = None
-        best_score = float('-inf')
+
+        # Для известных размеров берем раунд из готового расписания без повторов
+        design_tables = self._next_design_round()
+        if design_tables is not None:
+            self._log(f"DEBUG: Раунд {len(self.rounds) + 1} взят из резольвабельного дизайна")
+            self.last_search_report = {'source': 'design', 'stop_reason': None, 'attempts': 0, 'elapsed_ms': 0.0}
+            return self._commit_round(design_tables)
         
         # Увеличиваем количество попыток для последних раундов
-        remaining_pairs = len(all_pairs) - len(self.met_pairs)
-        if remaining_pairs < len(all_pairs) * 0.2:  # Если осталось менее 20% пар
+        remaining_pairs = total_pairs - met_pairs
+        if attempts is not None and remaining_pairs < total_pairs * 0.2:  # Если осталось менее 20% пар
             attempts *= 2
         
         # Пробуем несколько случайных рассадок и выбираем лучшую
-        for attempt in range(attempts):
-            # Приоритизируем участников, у которых меньше встреч
-            participant_meetings = {p: 0 for p in self.participants}
-            for pair in self.met_pairs:
-                for p in pair:
-                    participant_meetings[p] += 1
-                    
-            # Сортируем участников по количеству встреч (меньше встреч - выше приоритет)
-            shuffled_participants = sorted(
-                self.participants,
-                key=lambda p: (participant_meetings[p], random.random())
-            )
-            
-            # Используем функцию распределения по столам
-            tables = split_into_tables(shuffled_participants, self.n, self.m)
-            
-            # Оцениваем конфигурацию
-            score = self._evaluate_table_configuration(tables)
-            
-            if score > best_score:
-                best_score = score
-                best_tables = tables
-                
-                # Если нашли идеальную конфигурацию, останавливаемся
-                unpaired = self._get_unpaired_participants()
-            new_pairs = set()
-            for table in tables:
-                for i in range(len(table)):
-                    for j in range(i+1, len(table)):
-                        pair = frozenset([table[i], table[j]])
-                        if pair not in self.met_pairs:
-                            new_pairs.add(pair)
-            
-                if all(pair in new_pairs for pair in unpaired):
-                    break
+        budget = self._make_budget(attempts, deadline_ms, plateau_window)
+        if self.workers > 1 and self.engine != SearchEngine.greedy:
+            best_tables, best_score = self._parallel_search(budget)
+        else:
+            best_tables, best_score = self._search(budget)
+        budget.exhausted()
+
+        self.last_search_report = {
+            'source': 'search',
+            'stop_reason': budget.stop_reason.value if budget.stop_reason else None,
+            'attempts': budget.attempts_used,
+            'elapsed_ms': budget.elapsed_ms(),
+            'best_score': best_score,
+            'new_pairs': budget.best_new_pairs,
+            'new_pairs_upper_bound': budget.target_new_pairs
+        }
+        self._log(
+            f"DEBUG: Поиск остановлен ({self.last_search_report['stop_reason']}) после {budget.attempts_used} попыток "
+            f"за {budget.elapsed_ms():.0f} мс, новых пар {budget.best_new_pairs} из {budget.target_new_pairs} возможных")
         
         # Если не удалось найти хорошую конфигурацию
         if best_tables is None or best_score <= 0:
-            print(f"DEBUG: Не удалось найти хорошую конфигурацию после {attempts} попыток. best_score={best_score}")
+            self._log(f"DEBUG: Не удалось найти хорошую конфигурацию после {budget.attempts_used} попыток. best_score={best_score}")
             return None
         
-        print(f"DEBUG: Найдена конфигурация с оценкой {best_score}")
+        self._log(f"DEBUG: Найдена конфигурация с оценкой {best_score}")
         
         # Формируем раунд по лучшей рассадке
-        round_dict = {}
-        new_pairs_count = 0
-        for table_idx, table in enumerate(best_tables):
-            for participant in table:
-                round_dict[participant] = table_idx
-            # Добавляем новые пары в множество встреченных
-            for i in range(len(table)):
-                for j in range(i+1, len(table)):
-                    pair = frozenset([table[i], table[j]])
-                    if pair not in self.met_pairs:
-                        new_pairs_count += 1
-                    self.met_pairs.add(pair)
-        
-        print(f"DEBUG: Добавлено {new_pairs_count} новых пар в раунде")
-        self.rounds.append(round_dict)
-        return round_dict
+        return self._commit_round(best_tables)
     
     def get_coverage_percentage(self) -> float:
         """
@@ -274,10 +1879,10 @@ class SessionScheduler:
         
         :return: Процент покрытия от 0.0 до 1.0
         """
-        all_pairs = self.get_all_pairs()
-        if len(all_pairs) == 0:
+        total_pairs = self.get_total_pairs_count()
+        if total_pairs == 0:
             return 1.0
-        return len(self.met_pairs) / len(all_pairs)
+        return self.get_met_pairs_count() / total_pairs
     
     def get_session_stats(self) -> Dict:
         """
@@ -285,74 +1890,118 @@ class SessionScheduler:
         
         :return: Словарь со статистикой
         """
-        all_pairs = self.get_all_pairs()
-        met_users = set()
-        for first, second in self.met_pairs:
-            if first not in met_users:
-                met_users.add(first)
-            if second not in met_users:
-                met_users.add(second)
-
         return {
             'total_participants': len(self.participants),
             'total_rounds': len(self.rounds),
             'max_rounds': self._max_rounds,  # Добавляем информацию о максимальном количестве раундов
-            'total_pairs': len(all_pairs),
-            'met_pairs': len(self.met_pairs),
-            'met_users': len(met_users),
+            **self._get_optimality_stats(),
+            'total_pairs': self.get_total_pairs_count(),
+            'met_pairs': self.get_met_pairs_count(),
+            'met_users': self._met_users,
+            'repeated_pairs': len(self._repeated_pairs),
+            'total_repeated_meetings': self._total_repeated_meetings,
             'coverage_percentage': self.get_coverage_percentage(),
             'tables': self.n,
             'seats_per_table': self.m
         }
     
-    def check_repeated_meetings(self) -> Dict:
+    def get_metrics_snapshot(self) -> Dict:
+        """
+        Компактный снимок метрик для дашборда за O(1) по счетчикам планировщика,
+        без перечисления пар и участников
+
+        :return: Словарь с составом, номером раунда, нижней границей числа раундов,
+            встреченными и незнакомыми парами и повторами
+        """
+        total_pairs = self.get_total_pairs_count()
+        met_pairs = self.get_met_pairs_count()
+        return {
+            'total_participants': len(self._meetings),
+            'tables': self.n,
+            'seats_per_table': self.m,
+            'current_round': len(self.rounds),
+            'rounds_lower_bound': self.get_rounds_lower_bound(),
+            'total_pairs': total_pairs,
+            'met_pairs': met_pairs,
+            'strangers_num': total_pairs - met_pairs,
+            'repeated_pairs': len(self._repeated_pairs),
+            'total_repeated_meetings': self._total_repeated_meetings,
+            'coverage_percentage': met_pairs / total_pairs if total_pairs else 1.0
+        }
+
+    def get_pair_meeting_count(self, first: int, second: int) -> int:
+        """
+        Сколько раз пара встречалась за сессию, за O(1)
+
+        :param first: Первый участник
+        :param second: Второй участник
+        :return: Количество встреч
+        """
+        pair = (first, second) if first < second else (second, first)
+        if pair in self._repeated_pairs:
+            return self._repeated_pairs[pair]
+        return 1 if self.met_pairs.has_met(first, second) else 0
+
+    def get_top_repeated_pairs(self, k: int) -> List[Dict]:
+        """
+        k пар с наибольшим числом встреч, выбранные через кучу за O(r log k),
+        где r - количество пар с повторами
+
+        :param k: Количество пар
+        :return: Список словарей {'participants': [id, id], 'meeting_count': число} по убыванию встреч
+        """
+        top = heapq.nlargest(k, self._repeated_pairs.items(), key=lambda item: item[1])
+        return [{'participants': list(pair), 'meeting_count': count} for pair, count in top]
+
+    def get_repeated_meetings_summary(self) -> Dict:
+        """
+        Итоги повторных встреч за O(1) по индексу, обновляемому при фиксации раунда
+
+        :return: Словарь с количеством встреченных пар, пар с повторами, повторных встреч и процентом пар с повторами
+        """
+        pairs_checked = len(self.met_pairs)
+        repeated_pairs = len(self._repeated_pairs)
+        return {
+            'total_pairs_checked': pairs_checked,
+            'repeated_pairs': repeated_pairs,
+            'total_repeated_meetings': self._total_repeated_meetings,
+            'duplicate_percentage': (repeated_pairs / pairs_checked * 100) if pairs_checked else 0
+        }
+
+    def _get_optimality_stats(self) -> Dict:
+        """
+        Сравнение расписания с нижними границами:
+        - rounds_lower_bound - нижняя граница числа раундов для текущего состава (get_round_lower_bounds)
+        - remaining_rounds_lower_bound - сколько раундов еще нужно как минимум
+        - optimality_gap - на какую долю сыгранные раунды плюс оставшийся минимум
+          превышают нижнюю границу: 0 - расписание пока не потеряло ни одного раунда
+        - coverage_gap - доля пар, недобранных до максимума, возможного за сыгранные раунды
+        """
+        participants_count = len(self._meetings)
+        lower_bound = self.get_rounds_lower_bound()
+        remaining = self.get_remaining_rounds_lower_bound()
+        played = len(self.rounds)
+        reachable_pairs = min(
+            self.get_total_pairs_count(),
+            played * get_max_pairs_per_round(participants_count, self.n, self.m))
+        return {
+            'rounds_lower_bound': lower_bound,
+            'remaining_rounds_lower_bound': remaining,
+            'optimality_gap': max(0.0, (played + remaining - lower_bound) / lower_bound) if lower_bound else 0.0,
+            'coverage_gap': 1 - self.get_met_pairs_count() / reachable_pairs if reachable_pairs else 0.0
+        }
+
+    def check_repeated_meetings(self, top_k: Optional[int] = None) -> Dict:
         """
         Проверяет повторные встречи участников
         
+        :param top_k: Ограничить список повторных встреч k самыми частыми парами
         :return: Словарь со статистикой повторных встреч
         """
-        pair_meeting_count = {}
-        repeated_meetings = []
-        
-        # Подсчитываем количество встреч для каждой пары
-        for round_dict in self.rounds:
-            # Группируем участников по столам
-            tables = {}
-            for participant, table_id in round_dict.items():
-                if table_id not in tables:
-                    tables[table_id] = []
-                tables[table_id].append(participant)
-            
-            # Проверяем пары в каждом столе
-            for table_participants in tables.values():
-                for i in range(len(table_participants)):
-                    for j in range(i+1, len(table_participants)):
-                        pair = frozenset([table_participants[i], table_participants[j]])
-                        if pair not in pair_meeting_count:
-                            pair_meeting_count[pair] = 0
-                        pair_meeting_count[pair] += 1
-        
-        # Находим повторные встречи
-        for pair, count in pair_meeting_count.items():
-            if count > 1:
-                repeated_meetings.append({
-                    'participants': list(pair),
-                    'meeting_count': count
-                })
-        
-        # Сортируем по количеству повторений (по убыванию)
-        repeated_meetings.sort(key=lambda x: x['meeting_count'], reverse=True)
-        
-        total_repeated_pairs = len(repeated_meetings)
-        total_repeated_meetings = sum(item['meeting_count'] - 1 for item in repeated_meetings)
-        
-        return {
-            'total_pairs_checked': len(pair_meeting_count),
-            'repeated_pairs': total_repeated_pairs,
-            'total_repeated_meetings': total_repeated_meetings,
-            'repeated_meetings_list': repeated_meetings,
-            'duplicate_percentage': (total_repeated_pairs / len(pair_meeting_count) * 100) if pair_meeting_count else 0
-        }
+        stats = self.get_repeated_meetings_summary()
+        stats['repeated_meetings_list'] = self.get_top_repeated_pairs(
+            len(self._repeated_pairs) if top_k is None else top_k)
+        return stats
     
     def print_repeated_meetings_report(self):
         """
@@ -379,53 +2028,85 @@ class SessionScheduler:
         """
         Выводит детальную информацию о покрытии пар для отладки
         """
-        all_pairs = self.get_all_pairs()
+        total_pairs = self.get_total_pairs_count()
         met_pairs = self.met_pairs
         
         print(f"\n=== ДЕТАЛЬНАЯ ИНФОРМАЦИЯ О ПОКРЫТИИ ===")
-        print(f"Всего возможных пар: {len(all_pairs)}")
-        print(f"Встреченных пар: {len(met_pairs)}")
-        print(f"Покрытие: {len(met_pairs)/len(all_pairs)*100:.2f}%")
+        print(f"Всего возможных пар: {total_pairs}")
+        print(f"Встреченных пар: {self.get_met_pairs_count()}")
+        print(f"Покрытие: {self.get_coverage_percentage()*100:.2f}%")
         
         # Показываем все возможные пары
         print(f"\nВсе возможные пары:")
-        for pair in sorted(all_pairs):
-            pair_list = list(pair)
+        for pair in self.get_all_pairs():
+            pair_list = sorted(pair)
             status = "✓" if pair in met_pairs else "✗"
             print(f"  {status} {pair_list[0]} - {pair_list[1]}")
         
         # Показываем непокрытые пары
-        uncovered_pairs = all_pairs - met_pairs
-        if uncovered_pairs:
-            print(f"\nНепокрытые пары ({len(uncovered_pairs)}):")
-            for pair in sorted(uncovered_pairs):
-                pair_list = list(pair)
+        uncovered_count = total_pairs - self.get_met_pairs_count()
+        if uncovered_count > 0:
+            print(f"\nНепокрытые пары ({uncovered_count}):")
+            for pair in self._get_unpaired_participants():
+                pair_list = sorted(pair)
                 print(f"  ✗ {pair_list[0]} - {pair_list[1]}")
         else:
             print(f"\nВсе пары покрыты!")
 
 
-def get_ideal_tables_and_seats(n):
-    if n <= 0:
-        return (0, 0)
-    best_tables = 1
-    best_seats = n
-    min_diff = n
-    for tables in range(1, n+1):
-        if n % tables == 0:
-            seats = n // tables
-            diff = abs(seats - tables)
-            if diff < min_diff:
-                min_diff = diff
-                best_tables = tables
-                best_seats = seats
-    return best_tables, best_seats
-
 def get_max_rounds(users_count: int, seats_count: int):
     if users_count > 1 and seats_count > 1:
         return math.ceil((users_count - 1) / (seats_count - 1))
     return 1
 
+def get_round_lower_bounds(participants_count: int, num_tables: int, seats_per_table: int) -> Dict[str, int]:
+    """
+    Нижние границы числа раундов, за которые могут встретиться все пары, за O(1):
+    - degree: каждому участнику нужно встретить n−1 человек, а за раунд он встречает
+      не больше k−1, где k - наибольший возможный стол
+    - capacity: если мест меньше, чем участников, каждому нужно degree раундов
+      за столом, а за раунд рассаживается не больше мест, чем есть
+    - pairs: все n(n−1)/2 пар делятся на наибольшее число пар за раунд (get_max_pairs_per_round)
+    - schonheim: покрытию пар столами до k мест нужно не меньше ⌈n/k·⌈(n−1)/(k−1)⌉⌉ столов
+      (граница Шёнхейма), а за раунд накрывается не больше столов, чем есть
+    - best: наибольшая из границ
+
+    :param participants_count: Количество участников
+    :param num_tables: Количество столов
+    :param seats_per_table: Количество мест за столом
+    :return: Словарь с границами
+    """
+    sizes = get_table_sizes(participants_count, num_tables, seats_per_table)
+    if participants_count < 2 or not sizes:
+        return {'degree': 0, 'capacity': 0, 'pairs': 0, 'schonheim': 0, 'best': 0}
+
+    largest_table = min(max(seats_per_table, 2), participants_count)
+    seated = sum(sizes)
+    degree = math.ceil((participants_count - 1) / (largest_table - 1))
+    capacity = math.ceil(participants_count * degree / seated)
+    total_pairs = participants_count * (participants_count - 1) // 2
+    pairs = math.ceil(total_pairs / get_max_pairs_per_round(participants_count, num_tables, seats_per_table))
+    schonheim = math.ceil(math.ceil(participants_count * degree / largest_table) / len(sizes))
+
+    bounds = {'degree': degree, 'capacity': capacity, 'pairs': pairs, 'schonheim': schonheim}
+    bounds['best'] = max(bounds.values())
+    return bounds
+
+def estimate_session_memory(participants_count: int, seats_per_table: int) -> int:
+    """
+    Оценка памяти сессии с матричным хранилищем пар к концу сессии:
+    матрица пар, история из get_max_rounds раундов и индексы участников
+
+    :param participants_count: Количество участников
+    :param seats_per_table: Количество мест за столом
+    :return: Количество байт
+    """
+    matrix_bytes = participants_count * (participants_count - 1) // 2
+    # Номера столов занимают 2 байта, когда столов может быть 255 и больше
+    table_bytes = 1 if participants_count // 2 < np.iinfo(np.uint8).max else 2
+    history_bytes = participants_count * table_bytes * get_max_rounds(participants_count, seats_per_table)
+    return matrix_bytes + history_bytes + participants_count * PARTICIPANT_ENTRY_BYTES
+
 def test_seating_configurations():
     """
     Тестирует различные конфигурации рассадки участников
@@ -454,6 +2135,12 @@ def test_seating_configurations():
             "participants": list(range(1, 13)),
             "tables": 4,
             "seats": 3
+        },
+        {
+            "name": "Резольвабельный дизайн - 16 участников, 4 стола по 4 места",
+            "participants": list(range(1, 17)),
+            "tables": 4,
+            "seats": 4
         }
     ]
 
@@ -470,8 +2157,7 @@ def test_seating_configurations():
         print(f"Теоретический максимум раундов: {scheduler._max_rounds}")
         
         round_num = 0
-        all_pairs = scheduler.get_all_pairs()
-        total_pairs = len(all_pairs)
+        total_pairs = scheduler.get_total_pairs_count()
         
         while True:
             round_dict = scheduler.generate_next_round()
@@ -506,11 +2192,12 @@ def test_seating_configurations():
                     print(f"- {error}")
             
             # Выводим прогресс покрытия пар
-            coverage = len(scheduler.met_pairs) / total_pairs * 100
-            print(f"Прогресс: {len(scheduler.met_pairs)}/{total_pairs} пар ({coverage:.1f}%)")
+            met_pairs = scheduler.get_met_pairs_count()
+            coverage = met_pairs / total_pairs * 100
+            print(f"Прогресс: {met_pairs}/{total_pairs} пар ({coverage:.1f}%)")
             
             # Если все пары встретились, можно остановиться
-            if len(scheduler.met_pairs) == total_pairs:
+            if met_pairs == total_pairs:
                 print("\nДостигнуто 100% покрытие пар!")
                 break
         
@@ -526,5 +2213,222 @@ def test_seating_configurations():
         print(f"- Пар с повторными встречами: {repeated['repeated_pairs']}")
         print(f"- Всего повторных встреч: {repeated['total_repeated_meetings']}")
 
+
+def check_split_into_tables(trials: int = 2000, seed: int = random_seed_num) -> int:
+    """
+    Проверяет инварианты split_into_tables на случайных конфигурациях:
+    минимум 2 и не больше seats_per_table человек за столом, не больше
+    num_tables столов, разница размеров столов не больше 1, каждый участник
+    сидит не больше одного раза, а при нехватке мест рассаживаются первые участники
+
+    :param trials: Количество случайных конфигураций
+    :param seed: Зерно генератора конфигураций
+    :return: Количество найденных нарушений
+    """
+    rng = random.Random(seed)
+    errors = []
+    for _ in range(trials):
+        participants_count = rng.randint(0, 200)
+        num_tables = rng.randint(1, 60)
+        seats_per_table = rng.randint(2, 12)
+        participants = rng.sample(range(10 * participants_count + 1), participants_count)
+        tables = split_into_tables(participants, num_tables, seats_per_table, rng=rng)
+        case = f"{participants_count} участников, {num_tables} столов по {seats_per_table} мест"
+
+        sizes = [len(table) for table in tables]
+        seated = [participant for table in tables for participant in table]
+        capacity = min(num_tables, participants_count // 2) * seats_per_table
+        if len(tables) > num_tables:
+            errors.append(f"{case}: столов {len(tables)}")
+        if sizes and (min(sizes) < 2 or max(sizes) > seats_per_table):
+            errors.append(f"{case}: размеры столов {sizes}")
+        if sizes and max(sizes) - min(sizes) > 1:
+            errors.append(f"{case}: неравномерные столы {sizes}")
+        if len(set(seated)) != len(seated):
+            errors.append(f"{case}: участник сидит дважды")
+        if set(seated) != set(participants[:min(participants_count, capacity)]):
+            errors.append(f"{case}: рассажены не те участники")
+        if participants_count >= 2 and not tables:
+            errors.append(f"{case}: нет ни одного стола")
+
+    print(f"\n=== Проверка split_into_tables: {trials} конфигураций, нарушений: {len(errors)} ===")
+    for error in errors[:10]:
+        print(f"Ошибка: {error}")
+    return len(errors)
+
+
+def check_local_search_seating(trials: int = 40, seed: int = random_seed_num) -> int:
+    """
+    Проверяет, что локальный поиск сохраняет инварианты рассадки: сидят все, кто
+    помещается (get_table_sizes), а размеры столов различаются не больше чем на 1
+
+    :param trials: Количество случайных конфигураций
+    :param seed: Зерно генератора конфигураций
+    :return: Количество найденных нарушений
+    """
+    rng = random.Random(seed)
+    errors = []
+    # Первая конфигурация - 23 участника за 6 столами по 5 мест: свободные места есть
+    configurations = [(23, 6, 5)] + [(rng.randint(4, 60), rng.randint(1, 12), rng.randint(2, 7)) for _ in range(trials)]
+    for participants_count, num_tables, seats_per_table in configurations:
+        scheduler = SessionScheduler(
+            list(range(participants_count)), num_tables, seats_per_table,
+            engine=SearchEngine.local_search.value, use_designs=False)
+        scheduler.verbose = False
+        capacity = sum(get_table_sizes(participants_count, num_tables, seats_per_table))
+        case = f"{participants_count} участников, {num_tables} столов по {seats_per_table} мест"
+        for round_num in range(1, 4):
+            round_dict = scheduler.generate_next_round(attempts=300)
+            if round_dict is None:
+                break
+            sizes = list(collections.Counter(round_dict.values()).values())
+            if len(round_dict) != capacity:
+                errors.append(f"{case}, раунд {round_num}: рассажено {len(round_dict)} из {capacity}")
+            if max(sizes) - min(sizes) > 1:
+                errors.append(f"{case}, раунд {round_num}: неравномерные столы {sorted(sizes)}")
+
+    print(f"\n=== Проверка локального поиска: {len(configurations)} конфигураций, нарушений: {len(errors)} ===")
+    for error in errors[:10]:
+        print(f"Ошибка: {error}")
+    return len(errors)
+
+
+def check_greedy_seating(rounds: int = 6, draws: int = 5) -> int:
+    """
+    Проверяет, что жадная рассадка на собственной истории сессии дает не меньше
+    новых пар, чем в среднем случайная рассадка (одна попытка на раунд)
+
+    :param rounds: Количество раундов сессии
+    :param draws: Количество случайных сессий для среднего
+    :return: Количество найденных нарушений
+    """
+    def session_new_pairs(participants_count, num_tables, seats_per_table, engine, seed):
+        scheduler = SessionScheduler(
+            list(range(participants_count)), num_tables, seats_per_table,
+            engine=engine.value, use_designs=False, seed=seed)
+        scheduler.verbose = False
+        for _ in range(rounds):
+            scheduler.generate_next_round(attempts=1)
+        return scheduler.get_met_pairs_count()
+
+    errors = []
+    configurations = [(23, 6, 5), (30, 6, 5), (48, 8, 6), (100, 20, 5)]
+    for participants_count, num_tables, seats_per_table in configurations:
+        greedy = session_new_pairs(participants_count, num_tables, seats_per_table, SearchEngine.greedy, random_seed_num)
+        random_mean = sum(
+            session_new_pairs(participants_count, num_tables, seats_per_table, SearchEngine.random, seed)
+            for seed in range(draws)) / draws
+        if greedy < random_mean:
+            errors.append(
+                f"{participants_count} участников, {num_tables} столов по {seats_per_table} мест: "
+                f"жадная рассадка {greedy} пар, случайная в среднем {random_mean:.1f}")
+
+    print(f"\n=== Проверка жадной рассадки: {len(configurations)} конфигураций, нарушений: {len(errors)} ===")
+    for error in errors[:10]:
+        print(f"Ошибка: {error}")
+    return len(errors)
+
+
+def check_shape_changes() -> int:
+    """
+    Проверяет смену числа столов и мест посреди сессии: готовое расписание
+    из каталога дизайнов больше не используется, а раунды соблюдают новые ограничения
+
+    :return: Количество найденных нарушений
+    """
+    errors = []
+    scheduler = SessionScheduler(list(range(1, 17)), 4, 4)
+    scheduler.verbose = False
+    scheduler.generate_next_round()
+    if scheduler.last_search_report.get('source') != 'design':
+        errors.append("16 участников, 4 стола по 4 места: первый раунд не из дизайна")
+    for n, m in [(4, 3), (6, 3), (3, 5)]:
+        scheduler.n, scheduler.m = n, m
+        round_dict = scheduler.generate_next_round()
+        if round_dict is None:
+            errors.append(f"{n} столов по {m} мест: раунд не сгенерирован")
+            continue
+        sizes = collections.Counter(round_dict.values())
+        if scheduler.last_search_report.get('source') == 'design':
+            errors.append(f"{n} столов по {m} мест: использован дизайн для 4 столов по 4 места")
+        if len(sizes) > n or max(sizes.values()) > m:
+            errors.append(f"{n} столов по {m} мест: столы {sorted(sizes.values())}")
+        expected_bound = get_round_lower_bounds(16, n, m)['best']
+        if scheduler.get_metrics_snapshot()['rounds_lower_bound'] != expected_bound:
+            errors.append(f"{n} столов по {m} мест: в снимке метрик устаревшая нижняя граница раундов")
+
+    print(f"\n=== Проверка смены столов и мест: нарушений: {len(errors)} ===")
+    for error in errors[:10]:
+        print(f"Ошибка: {error}")
+    return len(errors)
+
+
+def check_roster_changes(steps: int = 300, seed: int = random_seed_num) -> int:
+    """
+    Проверяет инкрементальные счетчики при входе и выходе участников посреди сессии:
+    число встреч каждого участника, встреченные пары, участники со встречами,
+    покрытие и снимок метрик сравниваются с полным пересчетом по хранилищу пар
+
+    :param steps: Количество случайных событий (вход, выход, раунд)
+    :param seed: Зерно генератора событий
+    :return: Количество найденных нарушений
+    """
+    rng = random.Random(seed)
+    errors = []
+    for pair_backend in PairBackend:
+        scheduler = SessionScheduler(list(range(1, 21)), 5, 4, pair_backend=pair_backend.value, use_designs=False)
+        scheduler.verbose = False
+        next_participant = 21
+        for step in range(steps):
+            event = rng.random()
+            if event < 0.3:
+                scheduler.add_participant(next_participant)
+                next_participant += 1
+            elif event < 0.45 and scheduler.participants:
+                # Иногда возвращается ранее ушедший участник
+                scheduler.add_participant(rng.randrange(1, next_participant))
+            elif event < 0.7 and len(scheduler.participants) > 4:
+                scheduler.remove_participant(rng.choice(scheduler.participants))
+            else:
+                scheduler.generate_next_round(attempts=20)
+
+            active = list(scheduler.participants)
+            met = [(first, second) for first, second in itertools.combinations(active, 2)
+                   if scheduler.met_pairs.has_met(first, second)]
+            degrees = {participant: 0 for participant in active}
+            for first, second in met:
+                degrees[first] += 1
+                degrees[second] += 1
+            expected_total = len(active) * (len(active) - 1) // 2
+
+            if set(active) != set(scheduler._meetings) or len(set(active)) != len(active):
+                errors.append(f"{pair_backend.value} шаг {step}: состав участников расходится")
+            elif degrees != scheduler._meetings:
+                errors.append(f"{pair_backend.value} шаг {step}: число встреч расходится")
+            if scheduler.get_met_pairs_count() != len(met):
+                errors.append(f"{pair_backend.value} шаг {step}: встреченных пар {scheduler.get_met_pairs_count()} вместо {len(met)}")
+            if scheduler.get_total_pairs_count() != expected_total:
+                errors.append(f"{pair_backend.value} шаг {step}: всего пар {scheduler.get_total_pairs_count()} вместо {expected_total}")
+            if scheduler.get_session_stats()['met_users'] != sum(1 for count in degrees.values() if count > 0):
+                errors.append(f"{pair_backend.value} шаг {step}: участников со встречами расходится")
+            if scheduler.get_coverage_percentage() > 1.0:
+                errors.append(f"{pair_backend.value} шаг {step}: покрытие больше 100%")
+            snapshot = scheduler.get_metrics_snapshot()
+            if snapshot['strangers_num'] != expected_total - len(met):
+                errors.append(f"{pair_backend.value} шаг {step}: незнакомых пар в снимке метрик {snapshot['strangers_num']} вместо {expected_total - len(met)}")
+            if snapshot['rounds_lower_bound'] != get_round_lower_bounds(len(active), scheduler.n, scheduler.m)['best']:
+                errors.append(f"{pair_backend.value} шаг {step}: нижняя граница раундов в снимке метрик устарела")
+
+    print(f"\n=== Проверка входа и выхода участников: {steps} событий, нарушений: {len(errors)} ===")
+    for error in errors[:10]:
+        print(f"Ошибка: {error}")
+    return len(errors)
+
+
 if __name__ == '__main__':
+    check_split_into_tables()
+    check_local_search_seating()
+    check_greedy_seating()
+    check_shape_changes()
+    check_roster_changes()
     test_seating_configurations()
\ No newline at end of file
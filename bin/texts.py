@@ -41,8 +41,20 @@ def unable_to_update_users(error: str):
 def unable_to_update_metrics(error: str):
     return f"Не удалось обновить метрики: {error}"
 
-def show_ideal_tables_and_seats(tables: int, seats: int, rounds: int):
-    return f"Идеально: {tables} стол(а/ов) по {seats} мест\nМинимальное число раундов для покрытия всех пар: {rounds}"
+def show_ideal_tables_and_seats(tables: int, seats: int, rounds: int, coverage: float, estimated: bool = False):
+    return (f"Идеально: {tables} стол(а/ов) по {seats} мест\n"
+            f"Раундов: {rounds}, покрытие пар: {'≈' if estimated else ''}{coverage * 100:.0f}%")
+
+def show_configuration_advice(options, recommended):
+    if recommended is None:
+        return "Недостаточно участников для подбора параметров"
+    lines = [f"Идеально: {recommended.tables} стол(а/ов) по {recommended.seats} мест, раундов: {recommended.rounds}", "", "Варианты:"]
+    for option in options:
+        marker = "💡" if option == recommended else "•"
+        lines.append(f"{marker} {option.tables} × {option.seats}: раундов {option.rounds}, "
+                     f"покрытие {'≈' if option.estimated else ''}{option.coverage * 100:.0f}%, "
+                     f"баланс столов {option.balance * 100:.0f}%")
+    return "\n".join(lines)
 
 def show_ready_users(count: int, all_users: int):
     return f"Готовы: {count} из {all_users}"
@@ -1,8 +1,9 @@
 from json import load
+from contextlib import contextmanager
 from enum import Enum
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
 
-from bin import texts, models, markups, session, service
+from bin import texts, models, markups, session, service, cache, registry, advisor
 
 import telebot
 from telebot import types
@@ -10,6 +11,14 @@ from telebot import types
 with open("config.json", "r") as config_file:
     config = load(config_file)
 
+# Бюджет расчета плана сессии в фоне после первого раунда и число попыток поиска на раунд плана
+PLAN_TIME_BUDGET_MS = 3000
+PLAN_ATTEMPTS = 200
+# Срок поиска рассадки следующего раунда, чтобы бот отвечал администратору без задержек
+ROUND_DEADLINE_MS = 1500
+# Поиск раунда останавливается, если столько попыток подряд не дали улучшения
+ROUND_PLATEAU_WINDOW = 200
+
 class AdminState(Enum):
     default = "DEFAULT"
     change_tables_count = "CHANGE_TABLES_COUNT"
@@ -27,11 +36,17 @@ class AppContext:
             n=1, 
             m=1
         )
+        self.schedule_cache = cache.ScheduleCache()
+        # Сессии залов: у каждой свой планировщик, общий пул процессов и вытеснение завершенных
+        self.sessions = registry.SessionRegistry(schedule_cache=self.schedule_cache)
+        self.session_id = str(self.admin_chat_id)
         self.admin_chat_state = AdminState.default.value
         self.session_started = False
         self.admin_chat_last_message_id = 0
+        # Обновления дашборда отправляются в фоне, чтобы медленный API не задерживал обработчики бота
         self.app_service = service.AppService(
-            base_url=f"http://{config['server']['host']}:{config['server']['port']}/api"
+            base_url=f"http://{config['server']['host']}:{config['server']['port']}/api",
+            background=True
         )
         self.settings = models.Settings(
             tables_count=1,
@@ -40,6 +55,18 @@ class AppContext:
             break_time=1
         )
 
+    @contextmanager
+    def locked_session(self) -> Iterator[session.SessionScheduler]:
+        """
+        Планировщик текущей сессии для изменения состава, столов или мест.
+        Пока сессия в реестре, изменения ждут ее фоновых задач (расчета плана)
+        """
+        if self.sessions.get(self.session_id) is self.session:
+            with self.sessions.locked(self.session_id) as scheduler:
+                yield scheduler
+        else:
+            yield self.session
+
     def get_user_info(self, user_id: int):
         """Получает информацию о пользователе из соответствующего словаря"""
         return self.users.get(user_id)
@@ -124,33 +151,14 @@ class AppContext:
 
         # Обновляем метрики перед запуском таймера
         try:
-            session_stats = self.session.get_session_stats()
-            round_num = session_stats['total_rounds']
-            
-            # Формируем информацию о текущих столах
-            current_tables = {}
-            for user_id, user_info in self.users.items():
-                if user_info.table_num > 0:  # Пропускаем пользователей без стола
-                    table_idx = user_info.table_num - 1  # Преобразуем в 0-based индекс
-                    if table_idx not in current_tables:
-                        current_tables[table_idx] = []
-                    current_tables[table_idx].append(user_id)
-
-            print(f"[DEBUG] Отправка метрик в start_round:")
-            print(f"[DEBUG] session_stats: {session_stats}")
-            print(f"[DEBUG] current_tables: {current_tables}")
-            print(f"[DEBUG] round_num: {round_num}")
-
-            metrics_data = {
-                **session_stats,
-                'current_round_tables': current_tables
-            }
+            snapshot = self.session.get_metrics_snapshot()
+            print(f"[DEBUG] Отправка метрик в start_round: {snapshot}")
 
             self.app_service.send_metrics(
-                stats=metrics_data,
+                snapshot=snapshot,
                 round_time=self.settings.round_time,
                 break_time=self.settings.break_time,
-                round_num=round_num
+                round_num=snapshot['current_round']
             )
         except Exception as e:
             print(f"[DEBUG] {texts.unable_to_update_metrics(str(e))}")
@@ -268,8 +276,6 @@ def handle_admin_buttons(message: types.Message):
     ctx : AppContext = bot.context
 
     users_count = len(ctx.users)
-    tables_count, seats_count = session.get_ideal_tables_and_seats(users_count) 
-    rounds = session.get_max_rounds(users_count=users_count, seats_count=seats_count)
 
     match(message.text):
         case markups.AdminButtons.show_settings.value:
@@ -283,11 +289,16 @@ def handle_admin_buttons(message: types.Message):
                 text=texts.change_tables_count,
                 reply_markup=None
             )
-            bot.send_message(
-                chat_id=message.chat.id,
-                text=texts.show_ideal_tables_and_seats(tables_count, seats_count, rounds),
-                reply_markup=None
-            )
+            # Рекомендации кэшируются по числу участников, повторный расчет мгновенный
+            recommended = advisor.recommend_configuration(users_count)
+            if recommended is not None:
+                bot.send_message(
+                    chat_id=message.chat.id,
+                    text=texts.show_ideal_tables_and_seats(
+                        recommended.tables, recommended.seats, recommended.rounds,
+                        recommended.coverage, recommended.estimated),
+                    reply_markup=None
+                )
             ctx.admin_chat_state = AdminState.change_tables_count.value
 
         case markups.AdminButtons.add_mock_users.value:
@@ -308,13 +319,15 @@ def handle_admin_buttons(message: types.Message):
                 print(f'[DEBUG] Error while stoping session timer: {str(e)}')
 
             ctx.session_started = False
-            ctx.session = session.SessionScheduler(
+            ctx.session = ctx.sessions.create(
+                ctx.session_id,
                 participants=potentially_ready_users,
                 n=ctx.settings.tables_count,
                 m=ctx.settings.seats_count
             )
 
-            round_dict = ctx.session.generate_next_round()
+            # Первый раунд подбирается со сроком ROUND_DEADLINE_MS, как и остальные раунды
+            round_dict = ctx.sessions.generate_next_round(ctx.session_id, deadline_ms=ROUND_DEADLINE_MS, plateau_window=ROUND_PLATEAU_WINDOW)
             
             if round_dict is None:
                 bot.send_message(
@@ -322,6 +335,10 @@ def handle_admin_buttons(message: types.Message):
                     text=texts.unable_to_start_session,
                     reply_markup=markups.admin_main)
                 return
+
+            # Остальные раунды рассчитываются заранее в фоне, чтобы переход между раундами
+            # был мгновенным, а старт сессии не ждал бюджета плана
+            ctx.sessions.submit_plan_session(ctx.session_id, time_budget_ms=PLAN_TIME_BUDGET_MS, attempts=PLAN_ATTEMPTS)
             
             for participant_id, table_num in round_dict.items():
                 user_info = ctx.users[participant_id]
@@ -361,16 +378,10 @@ def handle_admin_buttons(message: types.Message):
 
             try:
                 ctx.app_service.send_metrics(
-                    stats={
-                        **ctx.session.get_session_stats(),
-                        'current_round_tables': {
-                            user_id: table_num - 1  # Преобразуем номера столов в 0-based индексы
-                            for user_id, user_info in ctx.users.items()
-                            if user_info.table_num > 0  # Пропускаем пользователей без стола
-                        }
-                    },
+                    snapshot=ctx.session.get_metrics_snapshot(),
                     round_time=ctx.settings.round_time,
-                    break_time=ctx.settings.break_time
+                    break_time=ctx.settings.break_time,
+                    round_num=len(ctx.session.rounds)
                 )
             except Exception as e:
                 print(f"[DEBUG] {texts.unable_to_update_metrics(str(e))}")
@@ -386,13 +397,14 @@ def handle_admin_buttons(message: types.Message):
             ready_users = [user_id for user_id, user_info in ctx.users.items() 
                 if user_info.user_state == models.UserState.ready.value]
             
-            for user_id in ready_users:
-                if not ctx.users[user_id].is_mock:  # Только для реальных пользователей меняем состояние
-                    ctx.session.add_participant(user_id)
-                    ctx.users[user_id].user_state = models.UserState.registered.value
+            with ctx.locked_session() as scheduler:
+                for user_id in ready_users:
+                    if not ctx.users[user_id].is_mock:  # Только для реальных пользователей меняем состояние
+                        scheduler.add_participant(user_id)
+                        ctx.users[user_id].user_state = models.UserState.registered.value
 
             # Генерируем новый раунд
-            round_dict = ctx.session.generate_next_round()
+            round_dict = ctx.sessions.generate_next_round(ctx.session_id, deadline_ms=ROUND_DEADLINE_MS, plateau_window=ROUND_PLATEAU_WINDOW)
 
             if round_dict is None:
                 bot.send_message(
@@ -436,29 +448,11 @@ def handle_admin_buttons(message: types.Message):
 
             # Обновляем метрики с актуальным номером раунда
             try:
-                session_stats = ctx.session.get_session_stats()
-                
-                # Формируем информацию о текущих столах
-                current_tables = {}
-                for user_id, user_info in ctx.users.items():
-                    if user_info.table_num > 0:  # Пропускаем пользователей без стола
-                        table_idx = user_info.table_num - 1  # Преобразуем в 0-based индекс
-                        if table_idx not in current_tables:
-                            current_tables[table_idx] = []
-                        current_tables[table_idx].append(user_id)
-
-                print(f"[DEBUG] Отправка метрик в next_round:")
-                print(f"[DEBUG] session_stats: {session_stats}")
-                print(f"[DEBUG] current_tables: {current_tables}")
-                print(f"[DEBUG] round_num: {round_num}")
-
-                metrics_data = {
-                    **session_stats,
-                    'current_round_tables': current_tables
-                }
+                snapshot = ctx.session.get_metrics_snapshot()
+                print(f"[DEBUG] Отправка метрик в next_round: {snapshot}")
 
                 ctx.app_service.send_metrics(
-                    stats=metrics_data,
+                    snapshot=snapshot,
                     round_time=ctx.settings.round_time,
                     break_time=ctx.settings.break_time,
                     round_num=round_num
@@ -480,7 +474,9 @@ def handle_admin_buttons(message: types.Message):
                 bot=bot,
                 message_id=ctx.admin_chat_last_message_id,
                 chat_id=ctx.admin_chat_id,
-                text=texts.show_ideal_tables_and_seats(tables=tables_count, seats=seats_count, rounds=rounds),
+                text=texts.show_configuration_advice(
+                    options=advisor.advise_configurations(users_count),
+                    recommended=advisor.recommend_configuration(users_count)),
                 keyboard=markups.admin_main
             )
         case markups.AdminButtons.finish_session.value:
@@ -498,12 +494,14 @@ def handle_admin_buttons(message: types.Message):
                         print(f'[DEBUG] Не удалось отправить сообщение пользователю {user_info.username}: {str(e)}')
             
             ctx.users.clear()
+            ctx.sessions.finish(ctx.session_id)
             ctx.session = session.SessionScheduler([], 1, 1)
 
             try:
                 ctx.app_service.clear_dashboard()
             except Exception as e:
                 print(f"[DEBUG] {texts.unable_to_update_users(str(e))}")
+            print(f"[DEBUG] Фоновая отправка на дашборд: {ctx.app_service.get_dispatch_stats()}")
 
             update_message(
                 bot=bot,
@@ -537,7 +535,8 @@ def handle_message(message: types.Message):
             username=fio, 
             table_num=0,
             message_id=message_id,
-            user_state=models.UserState.registered.value)
+            user_state=models.UserState.registered.value,
+            user_id=user_id)
         return
 
     if message.chat.id == ctx.admin_chat_id and message.text in markups.AdminButtons.to_array():
@@ -555,7 +554,8 @@ def handle_message(message: types.Message):
                 bot.send_message(chat_id=message.chat.id, text=texts.change_seats_count)
                 ctx.admin_chat_state = AdminState.change_seats_count.value
                 if ctx.session_started:
-                    ctx.session.n = ctx.settings.tables_count
+                    with ctx.locked_session() as scheduler:
+                        scheduler.n = ctx.settings.tables_count
 
             case AdminState.change_seats_count.value:
                 try:
@@ -566,7 +566,8 @@ def handle_message(message: types.Message):
                 bot.send_message(chat_id=message.chat.id, text=texts.change_round_time)
                 ctx.admin_chat_state = AdminState.change_round_time.value
                 if ctx.session_started:
-                    ctx.session.m = ctx.settings.seats_count
+                    with ctx.locked_session() as scheduler:
+                        scheduler.m = ctx.settings.seats_count
 
             case AdminState.change_round_time.value:
                 try:
@@ -596,11 +597,13 @@ def handle_message(message: types.Message):
                             username=mock_name,
                             table_num=0,
                             user_state=models.UserState.ready.value,  # Моковые пользователи всегда готовы
-                            is_mock=True
+                            is_mock=True,
+                            user_id=mock_id
                         )
                         # Сразу добавляем их в сессию, если она уже запущена
                         if ctx.session_started:
-                            ctx.session.add_participant(mock_id)
+                            with ctx.locked_session() as scheduler:
+                                scheduler.add_participant(mock_id)
                     
                     bot.send_message(
                         chat_id=message.chat.id,
@@ -644,7 +647,8 @@ def handle_callback_query(callback: types.CallbackQuery):
             )
             ctx.users[user_id] = models.UserInfo(
                 user_state=models.UserState.waiting_for_name.value,
-                message_id=message_id)
+                message_id=message_id,
+                user_id=user_id)
 
         case markups.CallbackTypes.leave_session.value:
             bot.send_message(
@@ -655,8 +659,9 @@ def handle_callback_query(callback: types.CallbackQuery):
             if user_id in ctx.users:
                 ctx.users.pop(user_id)
 
-            if user_id in ctx.session.participants:
-                ctx.session.remove_participant(user_id)
+            with ctx.locked_session() as scheduler:
+                if user_id in scheduler.participants:
+                    scheduler.remove_participant(user_id)
             
             message_id = update_message(
                 bot=bot,
@@ -771,4 +776,6 @@ def handle_callback_query(callback: types.CallbackQuery):
                         text=texts.all_users_ready_next
                     )
 
-bot.infinity_polling()
\ No newline at end of file
+bot.infinity_polling()
+# Отправляем на дашборд обновления, оставшиеся в очереди
+bot.context.app_service.close(timeout=5)
\ No newline at end of file
@@ -1,6 +1,7 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 import json
+import time
 from bin import models
 # Загружаем конфигурацию
 try:
@@ -14,7 +15,10 @@ CORS(app)  # Разрешаем CORS для React приложения
 
 class AppState:
     def __init__(self):
-        self.users = []  # Список пользователей с их размещением по столам
+        self.users = dict()  # Пользователи с их размещением по столам: {id: пользователь}
+        # Версия списка пользователей для дельта-обновлений. Начинается с текущего времени,
+        # чтобы после перезапуска сервера версии не совпали с версиями, известными боту
+        self.users_version = int(time.time() * 1000)
         self.metrics = dict()  # Метрики сессии
         self.settings = models.Settings(10, 5, 4, 2)  # По умолчанию: 10 столов, 5 мест, 4 раунда, 2 мин перерыв
         self.current_round = 0
@@ -31,13 +35,82 @@ def update_users():
         data = request.get_json()
         if not data or not isinstance(data, list):
             if data == []:
-                app_state.users = []
-                return jsonify({"message": f"Успешно"}), 200
+                app_state.users = dict()
+                app_state.users_version += 1
+                return jsonify({"message": f"Успешно", "version": app_state.users_version}), 200
             return jsonify({"error": "Неверный формат данных. Ожидается список пользователей"}), 400
         
-        app_state.users = data
+        if not all(isinstance(user, dict) for user in data):
+            return jsonify({"error": "Неверный формат данных. Ожидается список объектов пользователей"}), 400
+        # Пользователи без id или с id = None (старые версии бота) нумеруются по порядку
+        app_state.users = {user['id'] if user.get('id') is not None else index: user
+                           for index, user in enumerate(data)}
+        app_state.users_version += 1
         print(f"Обновлены данные пользователей: {len(data)} записей")
-        return jsonify({"message": f"Успешно обновлено {len(data)} пользователей", "count": len(data)}), 200
+        return jsonify({"message": f"Успешно обновлено {len(data)} пользователей", "count": len(data),
+                        "version": app_state.users_version}), 200
+    
+    except Exception as e:
+        print(f"Ошибка при обновлении пользователей: {e}")
+        return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}), 500
+
+def _is_user_id(value) -> bool:
+    """Идентификатор пользователя в дельте: число или строка"""
+    return isinstance(value, (int, str)) and not isinstance(value, bool)
+
+def _validate_users_delta(data: dict):
+    """
+    Проверяет поля дельты пользователей: added и changed - списки объектов с id,
+    removed - список id
+
+    :return: Описание ошибки или None, если дельта корректна
+    """
+    for field in ('added', 'changed', 'removed'):
+        if not isinstance(data.get(field, []), list):
+            return f"Поле {field} должно быть списком"
+    for field in ('added', 'changed'):
+        if not all(isinstance(user, dict) and _is_user_id(user.get('id')) for user in data.get(field, [])):
+            return f"В {field} ожидаются объекты пользователей с id"
+    if not all(_is_user_id(user_id) for user_id in data.get('removed', [])):
+        return "В removed ожидаются id пользователей"
+    return None
+
+@app.route('/api/users', methods=['PATCH'])
+def patch_users():
+    """
+    Дельта-обновление списка пользователей от бота.
+    Тело: {"base_version": версия, "added": [...], "changed": [...], "removed": [id, ...]},
+    в changed - id и изменившиеся поля пользователя.
+    Применяется, только если base_version совпадает с текущей версией, иначе
+    возвращается 409 и бот отправляет полный список
+    """
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict) or 'base_version' not in data:
+            return jsonify({"error": "Неверный формат данных. Ожидается объект с base_version"}), 400
+        error = _validate_users_delta(data)
+        if error:
+            return jsonify({"error": f"Неверный формат данных. {error}"}), 400
+        if data['base_version'] != app_state.users_version:
+            return jsonify({"error": "Версия списка пользователей не совпадает",
+                            "version": app_state.users_version}), 409
+
+        if any(user['id'] not in app_state.users for user in data.get('changed', [])):
+            return jsonify({"error": "Изменения для неизвестных пользователей",
+                            "version": app_state.users_version}), 409
+
+        for user_id in data.get('removed', []):
+            app_state.users.pop(user_id, None)
+        for user in data.get('added', []):
+            app_state.users[user['id']] = user
+        # Для измененных пользователей передаются только изменившиеся поля
+        for user in data.get('changed', []):
+            app_state.users[user['id']].update(user)
+        app_state.users_version += 1
+        count = len(data.get('added', [])) + len(data.get('changed', [])) + len(data.get('removed', []))
+        print(f"Дельта-обновление пользователей: {count} изменений, версия {app_state.users_version}")
+        return jsonify({"message": f"Успешно применено {count} изменений", "count": len(app_state.users),
+                        "version": app_state.users_version}), 200
     
     except Exception as e:
         print(f"Ошибка при обновлении пользователей: {e}")
@@ -47,7 +120,7 @@ def update_users():
 def get_users():
     """Получение списка пользователей для дашборда"""
     try:
-        return jsonify(app_state.users), 200
+        return jsonify(list(app_state.users.values())), 200
     except Exception as e:
         print(f"Ошибка при получении списка пользователей: {e}")
         return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}), 500
@@ -99,6 +172,7 @@ if __name__ == '__main__':
     print(f"Запуск сервера на {config['server']['host']}:{config['server']['port']}")
     print("Доступные endpoints:")
     print("  POST /api/users - обновление списка пользователей")
+    print("  PATCH /api/users - дельта-обновление списка пользователей")
     print("  GET /api/users - получение списка пользователей")
     print("  POST /api/metrics - обновление метрик")
     print("  GET /api/metrics - получение метрик")